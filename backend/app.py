@@ -1,15 +1,39 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, make_response, g
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+import assets
+import auth
+import columnar
 import database
+import event_codec
+import export
+import importer
+import metrics
+import presence
 import os
 import json
+import base64
+import datetime
+import io
+import zlib
 from functools import wraps
 import logging # Importar el módulo logging
 import sys     # Importar el módulo sys
+import time
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='/')
 CORS(app)
 
+# Proxies inversos de confianza delante de la aplicación (Apache/nginx con TLS). Con un valor
+# mayor que 0 se toman de las cabeceras X-Forwarded-* el esquema, el host, el prefijo y la IP
+# del cliente, de modo que request.is_secure es cierto cuando el proxy recibió HTTPS
+PROXY_HOPS = int(os.environ.get('WORKDAY_PROXY_HOPS', 0))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS, x_host=PROXY_HOPS,
+                            x_prefix=PROXY_HOPS)
+# Cookie de sesión solo por HTTPS: '1' siempre, '0' nunca; sin definir, si la petición llegó por HTTPS
+SECURE_COOKIE = os.environ.get('WORKDAY_SECURE_COOKIE')
+
 # Inicializa la base de datos al iniciar la aplicación Flask
 database.init_db()
 
@@ -26,40 +50,197 @@ else: # Si se ejecuta directamente (para desarrollo), envía a la consola
 # --- Fin de Configuración de Logging ---
 
 
+# --- Instrumentación (latencia, tamaño de respuesta y consultas) expuesta en /metrics ---
+METRICS_ENABLED = os.environ.get('WORKDAY_METRICS', '1') != '0'
+# Umbral en ms a partir del cual una petición se registra como lenta en el log (0 lo desactiva)
+SLOW_REQUEST_MS = float(os.environ.get('WORKDAY_SLOW_REQUEST_MS', 0))
+
+# Funciones de database.py de las que se registra duración, filas devueltas y errores
+INSTRUMENTED_DB_FUNCTIONS = [
+    'get_user', 'get_all_users', 'add_user', 'update_user', 'delete_user',
+    'save_workday', 'append_workday_event', 'delete_workday', 'get_workday',
+    'get_all_workdays_for_user', 'get_all_workdays_all_users', 'get_workdays_page',
+    'get_workday_summary', 'get_data_version', 'iter_workdays',
+]
+
+if METRICS_ENABLED:
+    metrics.instrument_module(database, INSTRUMENTED_DB_FUNCTIONS)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    if METRICS_ENABLED:
+        # En las respuestas en streaming no se conoce el tamaño y la latencia llega hasta el primer byte
+        size = None if response.is_streamed else response.content_length
+        metrics.observe_request(request.method, route, response.status_code, elapsed, size)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        if METRICS_ENABLED:
+            metrics.http_slow_requests.inc((request.method, route))
+        app.logger.warning(f"Petición lenta: {request.method} {request.full_path} -> "
+                           f"{response.status_code} en {elapsed * 1000:.1f} ms")
+    return response
+
+
+# Decorador para las rutas que requieren una sesión iniciada con /login
+def login_required(f):
+    """
+    Exige un token de sesión válido (cabecera Authorization, o la cookie en las rutas de
+    auth.COOKIE_ENDPOINTS) y deja el DNI y el rol del usuario en g.user_dni y g.user_role.
+    La comprobación usa la caché de auth.py, así que normalmente no consulta la base de datos.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        session = auth.authenticate(auth.request_token(request))
+        if session is None:
+            app.logger.error(f"Error 401: Sesión no válida o caducada en {request.method} {request.path}.")
+            return jsonify({'error': 'Sesión no válida o caducada'}), 401
+        g.user_dni, g.user_role = session
+        return f(*args, **kwargs)
+    return decorated_function
+
 # Decorador para verificar si el usuario es administrador
-# En una aplicación real, esto también debería verificar un token de sesión
 def admin_required(f):
     @wraps(f)
+    @login_required
     def decorated_function(*args, **kwargs):
-        user_dni = request.headers.get('X-User-DNI')
-        if not user_dni:
-            return jsonify({'error': 'DNI de usuario no proporcionado'}), 401
-
-        # Esto es una simplificación. En producción, se debería consultar
-        # la base de datos para verificar el rol del usuario por su DNI.
-        # Por ahora, asumimos que si el DNI es 'admin', tiene acceso.
-        # La función get_user_role_from_db debería ser implementada.
-        # user_role = database.get_user_role_by_dni(user_dni)
-        # if user_role != 'admin':
-        #    return jsonify({'error': 'Acceso denegado: Se requiere rol de administrador'}), 403
-
-        # Para esta implementación, simplemente verificamos si el DNI es 'admin'
-        # Esto es INSEGURO para producción y solo para fines de desarrollo/prueba.
-        if user_dni != 'admin': # Asumiendo 'admin' es el DNI del admin
+        if g.user_role != 'admin':
+            app.logger.error(f"Error 403: {g.user_dni} sin rol de administrador en {request.method} {request.path}.")
             return jsonify({'error': 'Acceso denegado: Se requiere rol de administrador'}), 403
-
         return f(*args, **kwargs)
     return decorated_function
 
 
+# Decorador para lecturas condicionales de los datos del usuario (ETag / If-None-Match)
+def conditional_user_get(f):
+    """
+    Añade ETag y Last-Modified, derivados de la versión de datos del usuario de la sesión,
+    a las respuestas GET correctas. Si If-None-Match coincide con la versión actual se
+    responde 304 sin ejecutar la vista, es decir, sin consultar la tabla de jornadas.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != 'GET':
+            return f(*args, **kwargs)
+        user_dni = g.user_dni
+
+        version, updated_at = database.get_data_version(user_dni)
+        # El CRC del DNI evita que dos usuarios con la misma versión compartan ETag
+        etag = f"{version}-{zlib.crc32(user_dni.encode()):08x}"
+        if columnar.wants_columns(request):
+            etag += '-c' # Otra representación de los mismos datos
+
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        if updated_at:
+            response.last_modified = datetime.datetime.fromtimestamp(updated_at / 1000, datetime.timezone.utc)
+        # El navegador debe revalidar siempre; la respuesta depende del usuario de la sesión
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        response.vary.add('Cookie')
+        return response
+    return decorated_function
+
+
+# --- Utilidades para parámetros de consulta ---
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+def parse_date_arg(name):
+    """Lee un parámetro de fecha YYYY-MM-DD de la query string. Lanza ValueError si no es válido."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"El parámetro '{name}' debe tener el formato YYYY-MM-DD")
+
+def parse_bool_arg(name, default=False):
+    """Lee un parámetro booleano de la query string ('1', 'true', 'yes' / '0', 'false', 'no')."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    return value.lower() not in ('0', 'false', 'no')
+
+def parse_limit_arg():
+    """Lee el tamaño de página ('limit'), acotado entre 1 y MAX_PAGE_SIZE."""
+    value = request.args.get('limit')
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("El parámetro 'limit' debe ser un número entero")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(key):
+    """Codifica la clave (user_dni, date) de la última fila como cursor opaco para el cliente."""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor):
+    """Decodifica un cursor generado por encode_cursor. Lanza ValueError si no es válido."""
+    if not cursor:
+        return None
+    try:
+        user_dni, date = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(user_dni), str(date)
+    except (ValueError, TypeError):
+        raise ValueError("El parámetro 'cursor' no es válido")
+
+def workdays_response(read_workdays):
+    """
+    Respuesta de un listado de jornadas: JSON o, si el cliente lo pide, formato columnar
+    (columnar.py), comprimida si supera columnar.COMPRESS_MIN_BYTES.
+    read_workdays(raw) devuelve (jornadas, campos adicionales de la respuesta); con raw=True
+    las jornadas son las filas sin convertir a diccionarios.
+    """
+    if columnar.wants_columns(request):
+        rows, extra = read_workdays(True)
+        payload = {'success': True, **columnar.encode_workdays(rows), **extra}
+        response = Response(columnar.dumps(payload), mimetype=columnar.MEDIA_TYPE)
+    else:
+        workdays, extra = read_workdays(False)
+        response = jsonify({'success': True, 'workdays': workdays, **extra})
+    response.vary.add('Accept')
+    return columnar.compress_response(request, response)
+
+
+# Frontend empaquetado con `python assets.py` (None si no se ha generado frontend/dist)
+ASSETS = assets.load()
+
 @app.route('/')
 def index():
-    """Sirve el archivo HTML principal."""
+    """Sirve el archivo HTML principal (el empaquetado, si existe, con las referencias con hash)."""
+    if ASSETS:
+        return ASSETS.send_index(request)
     return send_from_directory('../frontend', 'index.html')
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    """Sirve archivos estáticos (CSS, JS)."""
+    """
+    Sirve archivos estáticos (CSS, JS). Los nombres con hash del frontend empaquetado se
+    sirven precomprimidos y con caché inmutable; el resto, tal cual desde frontend/static.
+    """
+    if ASSETS:
+        response = ASSETS.send_static(request, filename)
+        if response is not None:
+            return response
     return send_from_directory('../frontend/static', filename)
 
 # RUTA CORREGIDA: Eliminado '/api'
@@ -70,24 +251,38 @@ def login():
     dni = data.get('dni')
     password = data.get('password')
 
-    user = database.get_user(dni, password)
-    if user:
-        return jsonify({'success': True, 'message': 'Login exitoso', 'user_dni': user['dni'], 'role': user['role']}), 200
+    session = auth.login(dni, password)
+    if session:
+        token, user, expires_at = session
+        response = jsonify({'success': True, 'message': 'Login exitoso', 'user_dni': user['dni'], 'role': user['role'],
+                            'token': token, 'expires_at': expires_at})
+        # La cookie solo la acepta el panel de presencia en directo (EventSource no envía cabeceras)
+        if user['role'] == 'admin' and presence.STREAM_ENABLED:
+            secure = request.is_secure if SECURE_COOKIE is None else SECURE_COOKIE == '1'
+            response.set_cookie(auth.COOKIE_NAME, token, max_age=int(auth.SESSION_TTL_HOURS * 3600),
+                                httponly=True, samesite='Strict', secure=secure)
+        return response, 200
     else:
         return jsonify({'success': False, 'message': 'DNI o contraseña incorrectos'}), 401
 
+@app.route('/logout', methods=['POST'])
+def logout():
+    """Cierra la sesión del token de la petición."""
+    auth.logout(auth.request_token(request))
+    response = jsonify({'success': True, 'message': 'Sesión cerrada'})
+    response.delete_cookie(auth.COOKIE_NAME)
+    return response, 200
+
 # RUTA CORREGIDA: Eliminado '/api'
 @app.route('/workday', methods=['GET', 'POST'])
+@login_required
+@conditional_user_get
 def workday():
     """
     GET: Obtiene los datos de la jornada para una fecha específica y usuario.
     POST: Guarda o actualiza los datos de la jornada.
     """
-    user_dni = request.headers.get('X-User-DNI')
-
-    if not user_dni:
-        app.logger.error("Error 401: DNI de usuario no proporcionado en los encabezados.")
-        return jsonify({'error': 'DNI de usuario no proporcionado en los encabezados'}), 401
+    user_dni = g.user_dni
 
     if request.method == 'GET':
         date = request.args.get('date')
@@ -112,30 +307,152 @@ def workday():
 
             database.save_workday(user_dni, data)
             return jsonify({'success': True, 'message': 'Jornada guardada exitosamente'}), 200
+        except database.ArchivedDateError as e:
+            app.logger.error(f"Error 409: Jornada de {user_dni} en un año archivado: {e}")
+            return jsonify({'success': False, 'message': str(e)}), 409
         except Exception as e:
             app.logger.error(f"Error al guardar jornada para {user_dni}: {e}", exc_info=True)
             return jsonify({'success': False, 'message': f'Error interno del servidor al guardar jornada: {str(e)}'}), 500
 
+@app.route('/workday/<date>/events', methods=['POST'])
+@login_required
+def append_workday_event(date):
+    """
+    Añade un único evento ({event, time, duration}) a la jornada de la fecha indicada.
+    Sustituye al envío de la jornada completa en cada fichaje. 'event' debe ser uno de
+    event_codec.EVENT_TYPES y 'Pausa Finalizada' requiere la duración de la pausa.
+    """
+    user_dni = g.user_dni
+
+    try:
+        date = datetime.date.fromisoformat(date).isoformat()
+    except ValueError:
+        app.logger.error(f"Error 400: Fecha inválida en POST /workday/{date}/events.")
+        return jsonify({'error': 'La fecha debe tener el formato YYYY-MM-DD'}), 400
+
+    data = request.get_json(silent=True) or {}
+    event = data.get('event')
+    time = data.get('time')
+    duration = data.get('duration')
+    if not isinstance(event, str) or not event or not isinstance(time, int) \
+            or (duration is not None and not isinstance(duration, int)):
+        app.logger.error(f"Error 400: Evento inválido en POST /workday/{date}/events. Datos recibidos: {data}")
+        return jsonify({'error': "El evento requiere 'event' (texto), 'time' (ms) y 'duration' opcional (ms)"}), 400
+    # Solo se aceptan los tipos de evento que interpreta el servidor
+    if event not in event_codec.EVENT_TYPES:
+        app.logger.error(f"Error 400: Tipo de evento desconocido en POST /workday/{date}/events: {event!r}")
+        return jsonify({'error': f"Tipo de evento no válido. Tipos admitidos: {', '.join(event_codec.EVENT_TYPES)}"}), 400
+    if event == database.EVENT_BREAK_FINISHED and (duration is None or duration < 0):
+        app.logger.error(f"Error 400: '{event}' sin duración válida en POST /workday/{date}/events. Datos recibidos: {data}")
+        return jsonify({'error': f"El evento '{event}' requiere 'duration' (ms)"}), 400
+
+    try:
+        workday_data = database.append_workday_event(user_dni, date, event, time, duration)
+        return jsonify({'success': True, 'workday': workday_data}), 200
+    except database.ArchivedDateError as e:
+        app.logger.error(f"Error 409: Evento de {user_dni} en un año archivado ({date}): {e}")
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except Exception as e:
+        app.logger.error(f"Error al añadir evento a la jornada de {user_dni} en fecha {date}: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': f'Error interno del servidor al guardar el evento: {str(e)}'}), 500
+
 # RUTA CORREGIDA: Eliminado '/api'
 @app.route('/workdays/user', methods=['GET'])
+@login_required
+@conditional_user_get
 def get_workdays_for_user():
-    """Obtiene todas las jornadas registradas para el usuario logueado."""
-    user_dni = request.headers.get('X-User-DNI')
-    if not user_dni:
-        app.logger.error("Error 401: DNI de usuario no proporcionado en los encabezados para /workdays/user.")
-        return jsonify({'error': 'DNI de usuario no proporcionado en los encabezados'}), 401
+    """
+    Obtiene las jornadas registradas para el usuario logueado, ordenadas por fecha.
+    Parámetros opcionales: from, to (YYYY-MM-DD), events=0 para omitir los eventos y
+    format=columns para el formato columnar.
+    """
+    user_dni = g.user_dni
+
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /workdays/user: {e}")
+        return jsonify({'error': str(e)}), 400
+    include_events = parse_bool_arg('events', default=True)
+
+    return workdays_response(
+        lambda raw: (database.get_all_workdays_for_user(user_dni, date_from, date_to, include_events, raw), {}))
+
+def parse_summary_args():
+    """
+    Lee los parámetros comunes de los resúmenes: granularity (week|month|year) y el
+    rango from/to en fechas YYYY-MM-DD, convertido a claves de periodo. Lanza ValueError.
+    """
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in database.SUMMARY_GRANULARITIES:
+        raise ValueError(f"El parámetro 'granularity' debe ser uno de: {', '.join(database.SUMMARY_GRANULARITIES)}")
+    date_from = parse_date_arg('from')
+    date_to = parse_date_arg('to')
+    period_from = database.period_keys(date_from)[granularity] if date_from else None
+    period_to = database.period_keys(date_to)[granularity] if date_to else None
+    return granularity, period_from, period_to
+
+@app.route('/workdays/summary', methods=['GET'])
+@login_required
+@conditional_user_get
+def get_workdays_summary():
+    """
+    Totales de trabajo del usuario logueado por semana, mes o año.
+    Parámetros: granularity (week|month|year, por defecto month) y from/to opcionales (YYYY-MM-DD).
+    """
+    user_dni = g.user_dni
+
+    try:
+        granularity, period_from, period_to = parse_summary_args()
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /workdays/summary: {e}")
+        return jsonify({'error': str(e)}), 400
+
+    summary = database.get_workday_summary(granularity, user_dni, period_from, period_to)
+    return jsonify({'success': True, 'granularity': granularity, 'summary': summary}), 200
+
+def stream_export(user_dni, filename_base):
+    """
+    Devuelve una respuesta que va generando la exportación mientras lee la base de datos por lotes.
+    Parámetros: format (csv|ndjson), from/to (YYYY-MM-DD), events=0, gzip=1 y tz (zona
+    horaria IANA en la que se escriben las horas del CSV; UTC si no se indica).
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in export.EXPORT_FORMATS:
+        raise ValueError(f"El parámetro 'format' debe ser uno de: {', '.join(export.EXPORT_FORMATS)}")
+    date_from = parse_date_arg('from')
+    date_to = parse_date_arg('to')
+    include_events = parse_bool_arg('events', default=True)
+    use_gzip = parse_bool_arg('gzip')
+    tz = export.parse_timezone(request.args.get('tz'))
+
+    generate, mimetype, extension = export.EXPORT_FORMATS[export_format]
+    chunks = generate(database.iter_workdays(user_dni, date_from, date_to, include_events), tz)
+    headers = {'Content-Disposition': f'attachment; filename="{filename_base}.{extension}"'}
+    if use_gzip:
+        chunks = export.gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@app.route('/workdays/export', methods=['GET'])
+@login_required
+def export_workdays_for_user():
+    """Exporta las jornadas del usuario logueado en CSV o NDJSON, generadas en streaming."""
+    user_dni = g.user_dni
 
-    all_workdays = database.get_all_workdays_for_user(user_dni)
-    return jsonify({'success': True, 'workdays': all_workdays}), 200
+    try:
+        return stream_export(user_dni, f'registro_jornadas_{user_dni}')
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /workdays/export: {e}")
+        return jsonify({'error': str(e)}), 400
 
 # RUTA CORREGIDA: Eliminado '/api'
 @app.route('/workday/delete', methods=['POST'])
+@login_required
 def delete_workday_route():
     """Elimina una jornada por fecha para un usuario específico."""
-    user_dni = request.headers.get('X-User-DNI')
-    if not user_dni:
-        app.logger.error("Error 401: DNI de usuario no proporcionado en los encabezados para /workday/delete.")
-        return jsonify({'error': 'DNI de usuario no proporcionado en los encabezados'}), 401
+    user_dni = g.user_dni
 
     data = request.get_json()
     date = data.get('date')
@@ -146,6 +463,9 @@ def delete_workday_route():
     try:
         database.delete_workday(user_dni, date)
         return jsonify({'success': True, 'message': f'Jornada del {date} eliminada exitosamente para {user_dni}'}), 200
+    except database.ArchivedDateError as e:
+        app.logger.error(f"Error 409: Eliminación de jornada de {user_dni} en un año archivado ({date}): {e}")
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         app.logger.error(f"Error al eliminar jornada para {user_dni} en fecha {date}: {e}", exc_info=True)
         return jsonify({'success': False, 'message': f'Error interno del servidor al eliminar jornada: {str(e)}'}), 500
@@ -153,7 +473,7 @@ def delete_workday_route():
 # --- Rutas de Administración ---
 # RUTAS CORREGIDAS: Eliminado '/api' de todas las rutas de administración
 @app.route('/admin/users', methods=['GET'])
-# @admin_required # Descomentar para habilitar la seguridad de roles
+@admin_required
 def admin_get_users():
     """Endpoint para que el administrador vea todos los usuarios."""
     try:
@@ -164,7 +484,7 @@ def admin_get_users():
         return jsonify({'success': False, 'message': f'Error interno del servidor al obtener usuarios: {str(e)}'}), 500
 
 @app.route('/admin/register_user', methods=['POST'])
-# @admin_required # Descomentar para habilitar la seguridad de roles
+@admin_required
 def admin_register_user():
     """Endpoint para que el administrador registre nuevos usuarios."""
     try:
@@ -187,7 +507,7 @@ def admin_register_user():
         return jsonify({'success': False, 'message': f'Error interno del servidor al registrar usuario: {str(e)}'}), 500
 
 @app.route('/admin/user/<dni>', methods=['PUT'])
-# @admin_required # Descomentar para habilitar la seguridad de roles
+@admin_required
 def admin_update_user(dni):
     """Endpoint para que el administrador actualice un usuario."""
     try:
@@ -209,7 +529,7 @@ def admin_update_user(dni):
         return jsonify({'success': False, 'message': f'Error interno del servidor al actualizar usuario: {str(e)}'}), 500
 
 @app.route('/admin/user/<dni>', methods=['DELETE'])
-# @admin_required # Descomentar para habilitar la seguridad de roles
+@admin_required
 def admin_delete_user(dni):
     """Endpoint para que el administrador elimine un usuario."""
     try:
@@ -224,11 +544,141 @@ def admin_delete_user(dni):
 
 
 @app.route('/admin/all_workdays', methods=['GET'])
-# @admin_required # Descomentar para habilitar la seguridad de roles
+@admin_required
 def admin_get_all_workdays():
-    """Endpoint para que el administrador vea las jornadas de todos los usuarios."""
-    all_workdays = database.get_all_workdays_all_users()
-    return jsonify({'success': True, 'workdays': all_workdays}), 200
+    """
+    Endpoint para que el administrador vea las jornadas de todos los usuarios, paginadas.
+    Parámetros opcionales: dni, from, to (YYYY-MM-DD), limit, cursor (devuelto como next_cursor),
+    events=0 para omitir los eventos y format=columns para el formato columnar.
+    """
+    try:
+        user_dni = request.args.get('dni') or None
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+        limit = parse_limit_arg()
+        after = decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /admin/all_workdays: {e}")
+        return jsonify({'error': str(e)}), 400
+    include_events = parse_bool_arg('events', default=True)
+
+    def read_workdays(raw):
+        workdays, next_key = database.get_workdays_page(user_dni, date_from, date_to, limit, after, include_events, raw)
+        return workdays, {'next_cursor': encode_cursor(next_key)}
+    return workdays_response(read_workdays)
+
+@app.route('/admin/workdays/summary', methods=['GET'])
+@admin_required
+def admin_get_workdays_summary():
+    """
+    Totales de trabajo de todos los usuarios por semana, mes o año.
+    Parámetros: granularity, from/to (YYYY-MM-DD), dni opcional y group=company para sumar
+    todos los usuarios en una fila por periodo.
+    """
+    try:
+        granularity, period_from, period_to = parse_summary_args()
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /admin/workdays/summary: {e}")
+        return jsonify({'error': str(e)}), 400
+
+    user_dni = request.args.get('dni') or None
+    by_user = request.args.get('group', 'user') != 'company'
+    summary = database.get_workday_summary(granularity, user_dni, period_from, period_to, by_user=by_user)
+    return jsonify({'success': True, 'granularity': granularity, 'summary': summary}), 200
+
+@app.route('/admin/workdays/export', methods=['GET'])
+@admin_required
+def admin_export_workdays():
+    """Exporta las jornadas de todos los usuarios (o del DNI indicado con 'dni') en streaming."""
+    user_dni = request.args.get('dni') or None
+    try:
+        return stream_export(user_dni, f'registro_jornadas_{user_dni}' if user_dni else 'registro_jornadas')
+    except ValueError as e:
+        app.logger.error(f"Error 400: Parámetros inválidos en GET /admin/workdays/export: {e}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/admin/import/<kind>', methods=['POST'])
+@admin_required
+def admin_bulk_import(kind):
+    """
+    Importación masiva de usuarios o jornadas ('users' o 'workdays') en CSV o NDJSON.
+    El fichero se envía como multipart ('file') o directamente en el cuerpo; el formato se
+    indica con el parámetro 'format' o se deduce de la extensión del fichero.
+    Devuelve los contadores y los errores por fila sin abortar la importación.
+    """
+    if kind not in importer.IMPORT_KINDS:
+        return jsonify({'error': f"Tipo de importación no soportado: {kind}"}), 404
+
+    upload = request.files.get('file')
+    fmt = request.args.get('format') or importer.detect_format(upload.filename if upload else None)
+    if fmt not in importer.IMPORT_FORMATS:
+        return jsonify({'error': f"El parámetro 'format' debe ser uno de: {', '.join(importer.IMPORT_FORMATS)}"}), 400
+
+    try:
+        raw = upload.stream if upload else request.stream
+        stream = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        result = importer.run_import(kind, stream, fmt)
+        return jsonify({'success': True, **result.to_dict()}), 200
+    except Exception as e:
+        app.logger.error(f"Error en la importación masiva de {kind}: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': f'Error interno del servidor al importar: {str(e)}'}), 500
+
+@app.route('/admin/presence', methods=['GET'])
+@admin_required
+def admin_presence():
+    """
+    Jornadas abiertas ahora mismo (trabajando o en pausa). Indica además si el servidor
+    admite el panel en directo (stream) o si el cliente debe repetir la consulta cada poll_seconds.
+    """
+    return jsonify({'success': True, 'workdays': presence.board.snapshot(),
+                    'stream': presence.STREAM_ENABLED, 'poll_seconds': presence.POLL_SECONDS}), 200
+
+@app.route('/admin/presence/stream', methods=['GET'])
+@admin_required
+def admin_presence_stream():
+    """
+    Server-Sent Events con las jornadas abiertas: un evento 'snapshot' con la lista completa al
+    conectar y después 'update' (usuario que ficha) o 'remove' (jornada finalizada o borrada).
+    Cada conexión ocupa un hilo mientras está abierta: requiere workers con hilos o gevent y
+    solo está disponible con WORKDAY_PRESENCE_STREAM=1.
+    """
+    if not presence.STREAM_ENABLED:
+        app.logger.error("Error 404: Panel de presencia en directo desactivado (WORKDAY_PRESENCE_STREAM).")
+        return jsonify({'error': 'Panel en directo desactivado: usa /admin/presence'}), 404
+    subscriber, snapshot = presence.board.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 5000\n" + presence.format_sse('snapshot', snapshot)
+            while not subscriber.closed:
+                message = subscriber.next_message(presence.HEARTBEAT_SECONDS)
+                yield ": keepalive\n\n" if message is None else presence.format_sse(*message)
+        finally:
+            presence.board.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Que nginx no acumule los eventos
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas de este worker en formato de texto de Prometheus."""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Métricas desactivadas'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/write_queue', methods=['GET'])
+@admin_required
+def admin_write_queue_stats():
+    """Configuración y métricas de la escritura agrupada de este worker."""
+    return jsonify({
+        'success': True,
+        'enabled': database.WRITE_BATCHING,
+        'max_items': database.WRITE_BATCH_MAX_ITEMS,
+        'max_delay_ms': database.WRITE_BATCH_MAX_DELAY_MS,
+        'stats': database.write_queue_stats(),
+    }), 200
 
 
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+"""
+Empaquetado de los ficheros del frontend para servirlos con caché de larga duración.
+
+`python assets.py` (desde backend/) copia cada fichero de frontend/static a
+frontend/dist/static con el hash de su contenido en el nombre (js/app.js ->
+js/app.3f2a9c1b7d4e.js) y, si es texto, con sus variantes precomprimidas .br (si el
+paquete brotli está instalado) y .gz. Después reescribe en index.html las referencias
+/static/... a los nombres con hash, lo comprime igual y guarda la correspondencia en
+frontend/dist/manifest.json.
+
+Si existe el manifiesto, app.py sirve index.html desde dist (Cache-Control: no-cache,
+revalidado con ETag) y los ficheros con hash con caché inmutable de un año, eligiendo la
+variante precomprimida según Accept-Encoding: los workers no comprimen nada y el navegador
+no vuelve a pedir un fichero hasta que cambia su contenido (y con él su nombre). Sin
+manifiesto (desarrollo) se sirven los ficheros originales. Hay que volver a ejecutar
+`python assets.py` en cada despliegue que cambie el frontend.
+
+Uso (desde backend/):
+    python assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from flask import send_from_directory
+
+try:
+    import brotli
+except ImportError: # Opcional: sin el paquete brotli solo se generan las variantes .gz
+    brotli = None
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend'))
+SOURCE_STATIC_DIR = os.path.join(FRONTEND_DIR, 'static')
+DIST_DIR = os.path.join(FRONTEND_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+INDEX_NAME = 'index.html'
+
+HASH_LENGTH = 12
+# Ficheros de texto que se precomprimen; el resto (imágenes, fuentes) ya va comprimido
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.map')
+# Niveles máximos: la compresión se hace una vez al empaquetar, no en cada petición
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Variantes en orden de preferencia: (Content-Encoding, extensión del fichero)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_STATIC_REFERENCE = re.compile(r'''(?<=["'(])/static/([^"'()?#\s]+)''')
+
+
+def _hashed_name(relative_path, data):
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write_variants(directory, relative_path, data):
+    """Escribe el fichero y sus variantes precomprimidas; devuelve los Content-Encoding generados."""
+    path = os.path.join(directory, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if not relative_path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return []
+    encodings = []
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=BROTLI_QUALITY))
+        encodings.append('br')
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0: el mismo contenido produce siempre los mismos bytes
+        f.write(gzip.compress(data, GZIP_LEVEL, mtime=0))
+    encodings.append('gzip')
+    return encodings
+
+
+def build(frontend_dir=FRONTEND_DIR):
+    """
+    Genera frontend/dist a partir de frontend/static e index.html y devuelve el manifiesto:
+    {'files': {ruta original: {'path': ruta con hash, 'encodings': [...]}}, 'index': {...}}.
+    El directorio dist anterior se sustituye entero.
+    """
+    source_dir = os.path.join(frontend_dir, 'static')
+    dist_dir = os.path.join(frontend_dir, 'dist')
+    staging_dir = dist_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_static = os.path.join(staging_dir, 'static')
+
+    files = {}
+    for directory, _dirs, names in os.walk(source_dir):
+        for name in sorted(names):
+            source_path = os.path.join(directory, name)
+            relative_path = os.path.relpath(source_path, source_dir).replace(os.sep, '/')
+            with open(source_path, 'rb') as f:
+                data = f.read()
+            hashed_path = _hashed_name(relative_path, data)
+            files[relative_path] = {'path': hashed_path,
+                                    'encodings': _write_variants(staging_static, hashed_path, data)}
+
+    with open(os.path.join(frontend_dir, INDEX_NAME), encoding='utf-8') as f:
+        index_html = f.read()
+    # Las referencias a ficheros que no existen (o que ya llevan hash) se dejan como están
+    index_html = _STATIC_REFERENCE.sub(
+        lambda match: f"/static/{files[match.group(1)]['path']}" if match.group(1) in files else match.group(0),
+        index_html)
+    index = {'path': INDEX_NAME, 'encodings': _write_variants(staging_dir, INDEX_NAME, index_html.encode('utf-8'))}
+
+    manifest = {'files': files, 'index': index}
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    # Sustituir dist de una vez para no dejar a medias lo que sirve una aplicación en marcha
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.rename(staging_dir, dist_dir)
+    return manifest
+
+
+class AssetManifest:
+    """Ficheros empaquetados por build() que sirve app.py."""
+
+    def __init__(self, dist_dir, manifest):
+        self.dist_dir = dist_dir
+        self.static_dir = os.path.join(dist_dir, 'static')
+        self.index = manifest['index']
+        # Ruta con hash -> Content-Encoding disponibles
+        self.hashed = {entry['path']: entry['encodings'] for entry in manifest['files'].values()}
+        self.sources = manifest['files']
+
+    def send_static(self, request, filename):
+        """Respuesta para /static/<filename> si es un fichero con hash del manifiesto, o None."""
+        encodings = self.hashed.get(filename)
+        if encodings is None:
+            return None
+        response = _send_variant(request, self.static_dir, filename, encodings, IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
+
+    def send_index(self, request):
+        """index.html con las referencias con hash; el navegador lo revalida siempre (ETag)."""
+        # Sin max_age, send_from_directory responde con Cache-Control: no-cache
+        return _send_variant(request, self.dist_dir, self.index['path'], self.index['encodings'])
+
+
+def _send_variant(request, directory, filename, encodings, max_age=None):
+    """Envía la variante precomprimida que acepta el cliente o, si no acepta ninguna, el original."""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, extension in ENCODINGS:
+        if encoding in encodings and request.accept_encodings[encoding]:
+            # send_from_directory calcula un ETag distinto por variante (nombre, tamaño y fecha).
+            # download_name: el Content-Disposition lleva el nombre del fichero original, no el .gz/.br
+            response = send_from_directory(directory, filename + extension, mimetype=mimetype, max_age=max_age,
+                                           download_name=os.path.basename(filename))
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=max_age)
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def load(dist_dir=DIST_DIR, source_dir=SOURCE_STATIC_DIR):
+    """
+    Carga el manifiesto de dist_dir; devuelve None si no se han empaquetado los ficheros.
+    Avisa en el log si algún fichero de frontend/static es más reciente que el empaquetado.
+    """
+    path = os.path.join(dist_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = AssetManifest(dist_dir, json.load(f))
+    except FileNotFoundError:
+        return None
+    built_at = os.path.getmtime(path)
+    index_path = os.path.join(os.path.dirname(source_dir), INDEX_NAME)
+    sources = [os.path.join(source_dir, name) for name in manifest.sources] + [index_path]
+    stale = [source for source in sources if os.path.exists(source) and os.path.getmtime(source) > built_at]
+    if stale:
+        logging.getLogger(__name__).warning(
+            "El frontend empaquetado es anterior a %s: ejecuta 'python assets.py' para regenerarlo",
+            ', '.join(os.path.relpath(source, os.path.dirname(source_dir)) for source in stale))
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    manifest = build()
+    for source, entry in sorted(manifest['files'].items()):
+        variants = ', '.join(entry['encodings']) or 'sin comprimir'
+        print(f"{source} -> static/{entry['path']} ({variants})")
+    print(f"index.html -> dist/{manifest['index']['path']} ({', '.join(manifest['index']['encodings'])})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
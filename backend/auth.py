@@ -0,0 +1,141 @@
+"""
+Sesiones de usuario: /login emite un token y cada petición protegida lo presenta en la
+cabecera Authorization (Bearer). La cookie COOKIE_NAME solo se acepta en COOKIE_ENDPOINTS,
+las rutas que abre EventSource, que no puede enviar cabeceras: el navegador adjunta la
+cookie a cualquier petición, así que en el resto de rutas serviría para CSRF.
+
+La base de datos guarda el hash de cada token (tabla sessions). Cada proceso mantiene
+además una caché acotada token -> (DNI, rol), así que comprobar la identidad y el rol de
+una petición no consulta SQLite salvo la primera vez que el proceso ve un token o cuando
+su entrada caduca (CACHE_TTL_SECONDS). update_user y delete_user avisan a la caché de este
+proceso; en los demás workers un cambio de rol o una sesión cerrada se nota como mucho
+tras CACHE_TTL_SECONDS.
+"""
+import collections
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+import database
+import metrics
+
+SESSION_TTL_HOURS = float(os.environ.get('WORKDAY_SESSION_TTL_HOURS', 12))
+CACHE_TTL_SECONDS = float(os.environ.get('WORKDAY_AUTH_CACHE_TTL_SECONDS', 60))
+CACHE_MAX_ENTRIES = int(os.environ.get('WORKDAY_AUTH_CACHE_MAX_ENTRIES', 10000))
+COOKIE_NAME = 'workday_session'
+# Endpoints de Flask en los que vale la cookie de sesión en lugar de la cabecera Authorization
+COOKIE_ENDPOINTS = frozenset({'admin_presence_stream'})
+
+
+class SessionCache:
+    """Caché LRU de sesiones con caducidad por entrada."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = collections.OrderedDict() # token -> (DNI, rol, válida hasta en time.monotonic())
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Devuelve (DNI, rol) si el token está en caché y no ha caducado."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0], entry[1]
+
+    def put(self, token, dni, role, expires_at):
+        """Guarda una sesión; la entrada no dura más que la propia sesión (`expires_at` en ms)."""
+        seconds_left = expires_at / 1000 - time.time()
+        valid_until = time.monotonic() + min(self.ttl_seconds, seconds_left)
+        with self._lock:
+            self._entries[token] = (dni, role, valid_until)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, dni):
+        """Descarta todas las sesiones de un usuario (listener de database.update_user/delete_user)."""
+        with self._lock:
+            for token in [token for token, entry in self._entries.items() if entry[0] == dni]:
+                del self._entries[token]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+cache = SessionCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+database.add_user_listener(cache.invalidate_user)
+
+cache_lookups = metrics.register(metrics.Counter(
+    'workday_auth_cache_lookups_total', 'Comprobaciones de sesión por resultado de la caché (hit|miss).',
+    ('result',)))
+metrics.register(metrics.Gauge('workday_auth_cache_entries', 'Sesiones en la caché de este worker.',
+                               lambda: len(cache)))
+
+
+def token_hash(token):
+    """Hash con el que se guarda el token en la base de datos."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def login(dni, password):
+    """
+    Comprueba las credenciales y abre una sesión.
+    Devuelve (token, usuario, caducidad en ms) o None si las credenciales no son válidas.
+    """
+    user = database.get_user(dni, password)
+    if not user:
+        return None
+    token = secrets.token_urlsafe(32)
+    expires_at = int((time.time() + SESSION_TTL_HOURS * 3600) * 1000)
+    database.create_session(user['dni'], token_hash(token), expires_at)
+    cache.put(token, user['dni'], user['role'], expires_at)
+    return token, user, expires_at
+
+
+def authenticate(token):
+    """Devuelve (DNI, rol) de una sesión vigente o None."""
+    if not token:
+        return None
+    session = cache.get(token)
+    if session is not None:
+        cache_lookups.inc(('hit',))
+        return session
+    cache_lookups.inc(('miss',))
+    row = database.get_session(token_hash(token))
+    if row is None:
+        return None
+    cache.put(token, *row)
+    return row[0], row[1]
+
+
+def logout(token):
+    """Cierra la sesión del token en la caché y en la base de datos."""
+    if token:
+        cache.invalidate(token)
+        database.delete_session(token_hash(token))
+
+
+def request_token(request):
+    """
+    Token de la petición: cabecera 'Authorization: Bearer ...' o, si no la hay y la ruta está
+    en COOKIE_ENDPOINTS, la cookie de sesión.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    if request.endpoint in COOKIE_ENDPOINTS:
+        return request.cookies.get(COOKIE_NAME)
+    return None
@@ -0,0 +1,10 @@
+"""
+Benchmarks del backend. Se ejecutan desde el directorio backend/, por ejemplo:
+
+    python -m benchmarks.micro --save       # funciones de database.py una a una
+    python -m benchmarks.load --save        # un día de fichajes contra la aplicación
+    python -m benchmarks.compare antes.json despues.json
+
+connections y events comparan variantes concretas (gestión de conexiones y formato de los
+eventos). Los resultados guardados con --save quedan en benchmarks/results/.
+"""
@@ -0,0 +1,234 @@
+"""Utilidades compartidas por los benchmarks: base de datos temporal, datos de ejemplo, medición y resultados."""
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Los benchmarks importan database.py y app.py como lo hace gunicorn, desde backend/
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def temp_database_path(prefix='bench'):
+    """Devuelve la ruta de un fichero SQLite nuevo dentro de un directorio temporal."""
+    return os.path.join(tempfile.mkdtemp(prefix=f'workday-{prefix}-'), 'workday.db')
+
+
+def load_backend(database_path):
+    """
+    Importa (o reimporta) database y app apuntando a database_path.
+    app.py inicializa la base de datos al importarse, así que la ruta debe fijarse antes.
+    """
+    os.environ['WORKDAY_DATABASE'] = database_path
+    import database
+    database.close_connections()
+    database = importlib.reload(database)
+    if 'app' in sys.modules:
+        del sys.modules['app']
+    import app
+    return database, app
+
+
+def make_events(day, rng):
+    """Genera los eventos de una jornada con el mismo formato que envía app.js."""
+    start = int(datetime.datetime.combine(day, datetime.time(8, rng.randint(30, 59))).timestamp() * 1000)
+    break_start = start + rng.randint(3, 4) * 3600 * 1000
+    break_duration = rng.randint(15, 45) * 60 * 1000
+    end = start + 8 * 3600 * 1000 + break_duration + rng.randint(0, 60) * 60 * 1000
+    events = [
+        {'event': 'Jornada Iniciada', 'time': start, 'duration': None},
+        {'event': 'Pausa Iniciada', 'time': break_start, 'duration': None},
+        {'event': 'Pausa Finalizada', 'time': break_start + break_duration, 'duration': break_duration},
+        {'event': 'Jornada Finalizada', 'time': end, 'duration': None},
+    ]
+    return {
+        'date': day.isoformat(),
+        'start_time': start,
+        'end_time': end,
+        'total_break_duration': break_duration,
+        'events': events,
+    }
+
+
+# Días laborables por año con los que --years se convierte en días de datos
+WORKING_DAYS_PER_YEAR = 250
+
+
+def add_dataset_arguments(parser, users=200, years=1.0):
+    """Añade los parámetros del conjunto de datos de prueba (--users, --years, --days)."""
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--years', type=float, default=years, help='años de jornadas por usuario')
+    parser.add_argument('--days', type=int, help='días laborables por usuario (sustituye a --years)')
+
+
+def dataset_days(args):
+    """Días laborables de datos que piden los argumentos de add_dataset_arguments."""
+    return args.days if args.days is not None else max(1, round(args.years * WORKING_DAYS_PER_YEAR))
+
+
+def prepare_database(prefix, users, days):
+    """
+    Crea una base de datos temporal con los datos de seed() y carga el backend sobre ella.
+    Devuelve (database, app, dnis, ruta).
+    """
+    path = temp_database_path(prefix)
+    database, app = load_backend(path)
+    conn = sqlite3.connect(path)
+    try:
+        dnis = seed(conn, users, days)
+    finally:
+        conn.close()
+    database.close_connections()
+    return database, app, dnis, path
+
+
+# Usuario administrador que crea seed() (misma contraseña que el resto)
+ADMIN_DNI = 'admin'
+
+
+def user_dnis(users):
+    """DNIs sintéticos y estables para los usuarios de prueba."""
+    return [f'{i:08d}B' for i in range(users)]
+
+
+def seed(conn, users, days, seed_value=1234, encode_events=None):
+    """
+    Rellena una base de datos ya inicializada con `users` usuarios y `days`
+    días laborables hacia atrás desde hoy. Escribe directamente con executemany
+    (y recalcula los agregados al final) para que la preparación sea rápida.
+    `encode_events` convierte los eventos al valor de la columna (por defecto, el de database.py).
+    """
+    import database
+
+    encode_events = encode_events or database.encode_events
+    rng = random.Random(seed_value)
+    dnis = user_dnis(users)
+    today = datetime.date.today()
+    dates = []
+    current = today
+    while len(dates) < days:
+        current -= datetime.timedelta(days=1)
+        if current.weekday() < 5:
+            dates.append(current)
+
+    password = database.hash_password('pass')
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO users (dni, password, role) VALUES (?, ?, 'user')",
+                         [(dni, password) for dni in dnis])
+        conn.execute("INSERT OR IGNORE INTO users (dni, password, role) VALUES (?, ?, 'admin')", (ADMIN_DNI, password))
+        for dni in dnis:
+            rows = []
+            for day in dates:
+                wd = make_events(day, rng)
+                rows.append((dni, wd['date'], wd['start_time'], wd['end_time'],
+                             wd['total_break_duration'], encode_events(wd['events'])))
+            conn.executemany('''
+                INSERT OR REPLACE INTO workdays (user_dni, date, start_time, end_time, total_break_duration, events)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+        # Las escrituras directas no pasan por save_workday: recalcular los agregados
+        database.rebuild_summaries(conn)
+    return dnis
+
+
+def auth_headers(client, dni, password='pass'):
+    """Inicia sesión con un cliente de pruebas de Flask y devuelve la cabecera Authorization."""
+    response = client.post('/login', json={'dni': dni, 'password': password})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def percentile(samples, pct):
+    """Percentil por el método del rango más cercano (samples ya ordenadas)."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def summarize(samples):
+    """Resume una lista de latencias en segundos como milisegundos."""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Ejecuta func y devuelve (resultado, segundos transcurridos)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_table(title, rows):
+    """
+    Imprime un diccionario {nombre: summarize(...)} como tabla de texto. Si las filas
+    incluyen 'throughput_rps' (peticiones u operaciones por segundo) se añade la columna.
+    """
+    with_throughput = any('throughput_rps' in stats for stats in rows.values())
+    print(f'\n{title}')
+    print(f"{'operación':<40}{'n':>7}{'media':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errores':>9}"
+          + (f"{'op/s':>10}" if with_throughput else ''))
+    for name, stats in rows.items():
+        print(f"{name:<40}{stats['count']:>7}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats.get('errors', 0):>9}"
+              + (f"{stats.get('throughput_rps', 0):>10.1f}" if with_throughput else ''))
+
+
+# Directorio por defecto de los resultados guardados (ignorado por git)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def save_results(benchmark, config, results, path=None):
+    """
+    Guarda los resultados de una ejecución en JSON para compararlos después con
+    benchmarks.compare. `config` son los parámetros de la ejecución y `results` el
+    diccionario {nombre: summarize(...)}. Devuelve la ruta del fichero.
+    """
+    started = datetime.datetime.now()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{benchmark}-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    document = {
+        'benchmark': benchmark,
+        'created_at': started.isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'config': config,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_results(path):
+    """Lee un fichero guardado con save_results."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _git_commit():
+    """Commit del árbol de trabajo, si se ejecuta dentro del repositorio git."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
@@ -0,0 +1,78 @@
+"""
+Compara dos ejecuciones guardadas con --save (micro, load o cualquier benchmark que use
+common.save_results): muestra para cada operación la latencia p50/p95/p99 y el rendimiento
+de la base y de la nueva, con la variación en porcentaje.
+
+Uso (desde backend/):
+    python -m benchmarks.compare benchmarks/results/load-20250101-090000.json benchmarks/results/load-20250102-090000.json
+    python -m benchmarks.compare base.json nuevo.json --threshold 10
+"""
+import argparse
+
+from benchmarks import common
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+
+
+def _change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(base, new, threshold):
+    """
+    Imprime la comparación y devuelve las operaciones cuyo p95 empeora más de `threshold`
+    por ciento (o cuyo rendimiento baja más de ese porcentaje).
+    """
+    print(f"Base:  {base.get('created_at')} (commit {base.get('git_commit')}) {base.get('config')}")
+    print(f"Nuevo: {new.get('created_at')} (commit {new.get('git_commit')}) {new.get('config')}")
+    if base.get('benchmark') != new.get('benchmark'):
+        print(f"Aviso: se comparan benchmarks distintos ({base.get('benchmark')} y {new.get('benchmark')})")
+
+    header = f"{'operación':<40}" + ''.join(f"{metric:>28}" for metric in METRICS)
+    print(f'\n{header}')
+    regressions = []
+    for name, after in new['results'].items():
+        before = base['results'].get(name)
+        if before is None:
+            print(f'{name:<40}  (solo en la ejecución nueva)')
+            continue
+        cells = []
+        for metric in METRICS:
+            if metric not in before or metric not in after:
+                cells.append(f"{'-':>28}")
+                continue
+            change = _change(before[metric], after[metric])
+            text = f'{before[metric]:.2f} -> {after[metric]:.2f}'
+            text += f' ({change:+.0f}%)' if change is not None else ''
+            cells.append(f'{text:>28}')
+        print(f'{name:<40}' + ''.join(cells))
+
+        slower = _change(before['p95_ms'], after['p95_ms'])
+        lower = _change(before.get('throughput_rps', 0), after.get('throughput_rps', 0))
+        if (slower is not None and slower > threshold) or (lower is not None and lower < -threshold):
+            regressions.append(name)
+    for name in base['results'].keys() - new['results'].keys():
+        print(f'{name:<40}  (solo en la ejecución base)')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help='resultados de referencia')
+    parser.add_argument('new', help='resultados a comparar')
+    parser.add_argument('--threshold', type=float, default=20,
+                        help='porcentaje a partir del cual se señala una regresión (por defecto 20)')
+    args = parser.parse_args(argv)
+
+    regressions = compare(common.load_results(args.base), common.load_results(args.new), args.threshold)
+    if regressions:
+        print(f"\nRegresiones de más del {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    print(f'\nSin regresiones de más del {args.threshold:.0f}%')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark antes/después de la gestión de conexiones de database.py.
+
+Compara dos modos sobre los endpoints existentes:
+  - legacy: una conexión nueva por llamada, journal en modo DELETE y sin PRAGMA
+    (el comportamiento original de database.py).
+  - pooled: conexión persistente por hilo con WAL y los PRAGMA de database.py.
+
+Uso (desde backend/):
+    python -m benchmarks.connections --users 200 --days 120 --threads 16
+"""
+import argparse
+import datetime
+import random
+import sqlite3
+import threading
+
+from benchmarks import common
+
+
+def _legacy_connection_factory(database):
+    """Reproduce el connect-por-llamada original, sin WAL ni busy_timeout ajustado."""
+    def get_connection(path=None):
+        return sqlite3.connect(path or database.DATABASE_NAME)
+    return get_connection
+
+
+def _prepare(mode, users, days):
+    path = common.temp_database_path(mode)
+    database, app = common.load_backend(path)
+    conn = sqlite3.connect(path)
+    if mode == 'legacy':
+        conn.execute("PRAGMA journal_mode = DELETE")
+    dnis = common.seed(conn, users, days)
+    conn.close()
+    database.close_connections()
+    if mode == 'legacy':
+        database.get_connection = _legacy_connection_factory(database)
+    return database, app.app, dnis
+
+
+def _run_threads(threads, worker):
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def run_mode(mode, users, days, threads, requests_per_thread):
+    database, flask_app, dnis = _prepare(mode, users, days)
+    today = datetime.date.today().isoformat()
+    login_client = flask_app.test_client()
+    headers = {dni: common.auth_headers(login_client, dni) for dni in dnis}
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def record(name, elapsed, ok):
+        with lock:
+            samples.setdefault(name, []).append(elapsed)
+            if not ok:
+                errors[name] = errors.get(name, 0) + 1
+
+    def clock_in_rush(index):
+        # Ráfaga de fichajes: cada hilo ficha a sus usuarios y relee el día
+        client = flask_app.test_client()
+        for n in range(requests_per_thread):
+            dni = dnis[(index * requests_per_thread + n) % len(dnis)]
+            payload = common.make_events(datetime.date.today(), random.Random(n))
+            payload['date'] = today
+            response, elapsed = common.timed(client.post, '/workday', json=payload, headers=headers[dni])
+            record('POST /workday', elapsed, response.status_code == 200)
+            response, elapsed = common.timed(client.get, f'/workday?date={today}', headers=headers[dni])
+            record('GET /workday', elapsed, response.status_code == 200)
+
+    def readers(index):
+        client = flask_app.test_client()
+        for n in range(max(1, requests_per_thread // 4)):
+            dni = dnis[(index + n) % len(dnis)]
+            response, elapsed = common.timed(client.post, '/login', json={'dni': dni, 'password': 'pass'})
+            record('POST /login', elapsed, response.status_code == 200)
+            session_headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+            response, elapsed = common.timed(client.get, '/workdays/user', headers=session_headers)
+            record('GET /workdays/user', elapsed, response.status_code == 200)
+
+    _run_threads(threads, clock_in_rush)
+    _run_threads(threads, readers)
+
+    client = flask_app.test_client()
+    admin_headers = common.auth_headers(client, common.ADMIN_DNI)
+    for _ in range(3):
+        response, elapsed = common.timed(client.get, '/admin/all_workdays', headers=admin_headers)
+        record('GET /admin/all_workdays', elapsed, response.status_code == 200)
+
+    database.close_connections()
+    results = {}
+    for name, values in samples.items():
+        results[name] = common.summarize(values)
+        results[name]['errors'] = errors.get(name, 0)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='peticiones de fichaje por hilo')
+    parser.add_argument('--mode', choices=['legacy', 'pooled', 'both'], default='both')
+    args = parser.parse_args(argv)
+
+    modes = ['legacy', 'pooled'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        results = run_mode(mode, args.users, args.days, args.threads, args.requests)
+        common.print_table(f'Modo {mode} ({args.users} usuarios, {args.days} días, {args.threads} hilos) - ms', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark del formato de la columna events: texto JSON frente al formato compacto (event_codec).
+
+Para cada formato crea una base de datos con los mismos datos de ejemplo, la compacta con
+VACUUM y mide:
+  - el tamaño del fichero,
+  - el tiempo de decodificar los eventos de todas las filas,
+  - la latencia de los endpoints de listado con y sin eventos.
+La base de datos JSON se rellena como las creadas antes del formato compacto; la compacta se
+obtiene aplicando a esos mismos datos la migración de database.py.
+
+Uso (desde backend/):
+    python -m benchmarks.events --users 200 --days 250 --repeat 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from benchmarks import common
+
+
+def _prepare(events_format, users, days):
+    path = common.temp_database_path(f'events-{events_format}')
+    database, app = common.load_backend(path)
+    conn = sqlite3.connect(path)
+    dnis = common.seed(conn, users, days, encode_events=json.dumps)
+    if events_format == 'compact':
+        with conn:
+            database._migration_compact_events(conn)
+    conn.execute("VACUUM")
+    conn.close()
+    database.close_connections()
+    return database, app.app, dnis, path
+
+
+def _decode_all(database, path):
+    conn = sqlite3.connect(path)
+    try:
+        values = [row[0] for row in conn.execute("SELECT events FROM workdays")]
+    finally:
+        conn.close()
+    start = time.perf_counter()
+    for value in values:
+        database.decode_events(value)
+    return len(values), time.perf_counter() - start
+
+
+def run_format(events_format, users, days, repeat):
+    database, flask_app, dnis, path = _prepare(events_format, users, days)
+    size = os.path.getsize(path)
+    rows, decode_seconds = _decode_all(database, path)
+
+    client = flask_app.test_client()
+    admin_headers = [common.auth_headers(client, common.ADMIN_DNI)]
+    user_headers = [common.auth_headers(client, dni) for dni in dnis[:repeat]]
+    requests = {
+        'GET /workdays/user': ('/workdays/user', user_headers),
+        'GET /workdays/user events=0': ('/workdays/user?events=0', user_headers),
+        'GET /admin/all_workdays': ('/admin/all_workdays?limit=500', admin_headers),
+        'GET /admin/all_workdays events=0': ('/admin/all_workdays?limit=500&events=0', admin_headers),
+    }
+    results = {}
+    for name, (url, headers) in requests.items():
+        samples = []
+        errors = 0
+        for n in range(repeat):
+            response, elapsed = common.timed(client.get, url, headers=headers[n % len(headers)])
+            samples.append(elapsed)
+            errors += response.status_code != 200
+        results[name] = common.summarize(samples)
+        results[name]['errors'] = errors
+
+    database.close_connections()
+    return size, rows, decode_seconds, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=250)
+    parser.add_argument('--repeat', type=int, default=20, help='peticiones por endpoint')
+    args = parser.parse_args(argv)
+
+    for events_format in ('json', 'compact'):
+        size, rows, decode_seconds, results = run_format(events_format, args.users, args.days, args.repeat)
+        print(f'\nFormato {events_format}: {size / 1024 / 1024:.2f} MiB, {rows} jornadas, '
+              f'decodificar todos los eventos: {decode_seconds * 1000:.1f} ms '
+              f'({decode_seconds / max(rows, 1) * 1e6:.2f} µs por jornada)')
+        common.print_table(f'Listados ({args.users} usuarios, {args.days} días) - ms', results)
+
+
+if __name__ == '__main__':
+    main()
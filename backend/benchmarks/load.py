@@ -0,0 +1,364 @@
+"""
+Generador de carga: reproduce un día de trabajo contra la aplicación Flask.
+
+Cada empleado es un usuario virtual (un hilo) que sigue el guion de app.js:
+  - llega hacia las 08:45 (la mayoría en la misma media hora): POST /login, GET /workday
+    del día y el fichaje de inicio,
+  - a media jornada inicia y finaliza la pausa,
+  - consulta de vez en cuando su semana, su mes o su resumen mensual,
+  - ficha la salida unas 8 horas después de entrar.
+Los administradores (--admins) consultan a lo largo del día la presencia, la lista de
+jornadas, los resúmenes de la empresa y exportan el mes por la tarde.
+
+El día (07:00 a 19:00) se comprime en --duration segundos; con --duration 0 cada usuario
+virtual lanza su guion sin esperas (prueba de estrés). Los fichajes usan POST
+/workday/<fecha>/events como app.js, o POST /workday con la jornada completa con
+--clock-in workday.
+
+Destinos:
+  - por defecto, en proceso, con el cliente de pruebas de Flask;
+  - --gunicorn N arranca gunicorn con N workers sobre la base de datos temporal;
+  - --url http://host:puerto ataca un servidor ya arrancado sobre una base de datos
+    preparada antes con --seed-only (mismos --users y --years).
+
+Informa de la latencia p50/p95/p99 y del rendimiento por endpoint; con --save guarda los
+resultados para compararlos con benchmarks.compare.
+
+Uso (desde backend/):
+    python -m benchmarks.load --users 200 --years 1 --duration 60
+    python -m benchmarks.load --users 500 --gunicorn 4 --duration 0 --save
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from benchmarks import common
+
+DAY_START = datetime.time(7, 0)
+DAY_SECONDS = 12 * 3600
+HOUR = 3600
+
+
+class InProcessClient:
+    """Peticiones a la aplicación en este proceso con el cliente de pruebas de Flask."""
+
+    def __init__(self, flask_app):
+        self._client = flask_app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self._client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Peticiones HTTP a un servidor externo, reutilizando la conexión si el servidor lo permite."""
+
+    def __init__(self, base_url):
+        url = urllib.parse.urlsplit(base_url)
+        self._connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        self._prefix = url.path.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._connection.request(method, self._prefix + path, data, headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self._connection.close() # La siguiente petición abre una conexión nueva
+            raise
+
+
+class VirtualUser:
+    """
+    Guion de un usuario: lista de acciones (segundo del día, nombre del endpoint, función)
+    que se ejecutan en orden. Cada función recibe el usuario y devuelve (método, ruta,
+    cuerpo, estados válidos). Los listeners(nombre, estado, cuerpo) reciben cada respuesta.
+    """
+
+    def __init__(self, dni, client):
+        self.dni = dni
+        self.client = client
+        self.headers = {}
+        self.actions = []
+        self.listeners = []
+
+    def add(self, at, name, build):
+        self.actions.append((at, name, build))
+
+    def login(self):
+        return 'POST', '/login', {'dni': self.dni, 'password': 'pass'}, (200,)
+
+    def on_response(self, name, status, data):
+        if name == 'POST /login' and status == 200:
+            self.headers = {'Authorization': f"Bearer {json.loads(data)['token']}"}
+        for listener in self.listeners:
+            listener(name, status, data)
+
+
+def _ms(day, seconds):
+    """Hora en ms (epoch) de un segundo del día simulado."""
+    start = datetime.datetime.combine(day, DAY_START)
+    return int((start + datetime.timedelta(seconds=seconds)).timestamp() * 1000)
+
+
+def employee_script(user, day, rng, clock_in):
+    """Añade a `user` el día de un empleado: entrada, pausa, consultas y salida."""
+    today = day.isoformat()
+    week_from = (day - datetime.timedelta(days=day.weekday())).isoformat()
+    month_from = day.replace(day=1).isoformat()
+    arrive = min(max(rng.gauss(1.75 * HOUR, 0.3 * HOUR), 0.25 * HOUR), 4 * HOUR)
+    break_start = arrive + rng.uniform(3, 4.5) * HOUR
+    break_duration = rng.randint(15, 45) * 60
+    leave = arrive + 8 * HOUR + break_duration + rng.uniform(0, 0.5) * HOUR
+    events = []
+
+    def clock(name, at, duration=None):
+        def build(_user):
+            entry = {'event': name, 'time': _ms(day, at), 'duration': duration}
+            events.append(entry)
+            if clock_in == 'events':
+                return 'POST', f'/workday/{today}/events', entry, (200,)
+            # Cliente que reenvía la jornada completa en cada fichaje
+            breaks = sum(e['duration'] or 0 for e in events)
+            payload = {'date': today, 'start_time': events[0]['time'],
+                       'end_time': entry['time'] if name == 'Jornada Finalizada' else None,
+                       'total_break_duration': breaks, 'events': list(events)}
+            return 'POST', '/workday', payload, (200,)
+        return build
+
+    clock_name = 'POST /workday/<date>/events' if clock_in == 'events' else 'POST /workday'
+    user.add(arrive, 'POST /login', lambda u: u.login())
+    user.add(arrive + 2, 'GET /workday', lambda u: ('GET', f'/workday?date={today}', None, (200, 404)))
+    user.add(arrive + 10, clock_name, clock('Jornada Iniciada', arrive + 10))
+    user.add(break_start, clock_name, clock('Pausa Iniciada', break_start))
+    user.add(break_start + break_duration, clock_name,
+             clock('Pausa Finalizada', break_start + break_duration, break_duration * 1000))
+
+    reads = [
+        ('GET /workday', f'/workday?date={today}', (200, 404)),
+        ('GET /workdays/user (semana)', f'/workdays/user?from={week_from}&to={today}&events=0&format=columns', (200,)),
+        ('GET /workdays/user (mes)', f'/workdays/user?from={month_from}&to={today}&events=0&format=columns', (200,)),
+        ('GET /workdays/summary', '/workdays/summary?granularity=month', (200,)),
+    ]
+    for at in sorted(rng.uniform(arrive + 60, leave) for _ in range(rng.randint(0, 4))):
+        name, path, statuses = rng.choice(reads)
+        user.add(at, name, lambda u, path=path, statuses=statuses: ('GET', path, None, statuses))
+    if rng.random() < 0.02:
+        user.add(leave - 60, 'GET /workdays/export', lambda u: ('GET', '/workdays/export?format=csv', None, (200,)))
+    user.add(leave, clock_name, clock('Jornada Finalizada', leave))
+    user.actions.sort(key=lambda action: action[0])
+
+
+def admin_script(user, day, rng):
+    """Añade a `user` el día de un administrador: presencia, listados, resúmenes y exportación."""
+    today = day.isoformat()
+    month_from = day.replace(day=1).isoformat()
+    pages = {}
+
+    def all_workdays(u):
+        return 'GET', '/admin/all_workdays?events=0&format=columns', None, (200,)
+
+    def next_page(u):
+        cursor = pages.get('cursor')
+        suffix = f'&cursor={urllib.parse.quote(cursor)}' if cursor else ''
+        return 'GET', f'/admin/all_workdays?events=0&format=columns{suffix}', None, (200,)
+
+    def on_page(name, status, data):
+        if name.startswith('GET /admin/all_workdays') and status == 200:
+            pages['cursor'] = json.loads(data).get('next_cursor')
+
+    user.listeners.append(on_page)
+    at = rng.uniform(0.5, 1.5) * HOUR
+    user.add(at, 'POST /login', lambda u: u.login())
+    user.add(at + 5, 'GET /admin/users', lambda u: ('GET', '/admin/users', None, (200,)))
+    while at < DAY_SECONDS:
+        user.add(at + 10, 'GET /admin/presence', lambda u: ('GET', '/admin/presence', None, (200,)))
+        user.add(at + 30, 'GET /admin/all_workdays', all_workdays)
+        user.add(at + 40, 'GET /admin/all_workdays (siguiente)', next_page)
+        user.add(at + 60, 'GET /admin/workdays/summary', lambda u: (
+            'GET', f'/admin/workdays/summary?granularity=month&from={month_from}&to={today}', None, (200,)))
+        user.add(at + 70, 'GET /admin/workdays/summary (empresa)', lambda u: (
+            'GET', '/admin/workdays/summary?granularity=year&group=company', None, (200,)))
+        at += rng.uniform(0.5, 1.0) * HOUR
+    export_at = rng.uniform(9, 11) * HOUR
+    user.add(export_at, 'GET /admin/workdays/export', lambda u: (
+        'GET', f'/admin/workdays/export?format=csv&from={month_from}&to={today}&events=0', None, (200,)))
+    user.actions.sort(key=lambda action: action[0])
+
+
+class Recorder:
+    """Acumula las latencias y los errores de todos los hilos por endpoint."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lag = []
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed, ok, lag):
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            self.lag.append(lag)
+
+    def results(self, wall_seconds):
+        results = {}
+        for name in sorted(self.samples):
+            stats = common.summarize(self.samples[name])
+            stats['errors'] = self.errors.get(name, 0)
+            stats['throughput_rps'] = len(self.samples[name]) / wall_seconds
+            results[name] = stats
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        results['total'] = common.summarize(everything)
+        results['total']['errors'] = sum(self.errors.values())
+        results['total']['throughput_rps'] = len(everything) / wall_seconds
+        return results
+
+
+def run_user(user, started, scale, recorder):
+    for at, name, build in user.actions:
+        due = started + at * scale
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        method, path, body, statuses = build(user)
+        began = time.perf_counter()
+        try:
+            status, data = user.client.request(method, path, body, user.headers)
+        except Exception:
+            status, data = None, b''
+        elapsed = time.perf_counter() - began
+        # Retraso respecto al guion: si crece, el cliente no da abasto y la carga es menor que la pedida
+        recorder.record(name, elapsed, status in statuses, max(0.0, began - due))
+        user.on_response(name, status, data)
+
+
+def replay_day(users, duration):
+    """Ejecuta los guiones (un hilo por usuario virtual) y devuelve (Recorder, segundos)."""
+    recorder = Recorder()
+    scale = duration / DAY_SECONDS
+    started = time.perf_counter() + 0.5 # Margen para arrancar todos los hilos
+    threads = [threading.Thread(target=run_user, args=(user, started, scale, recorder), daemon=True)
+               for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(database_path, workers, threads):
+    """Arranca gunicorn sobre database_path y espera a que acepte conexiones. Devuelve (proceso, URL)."""
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    env = dict(os.environ, WORKDAY_DATABASE=database_path)
+    process = subprocess.Popen(command, cwd=common.BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'gunicorn terminó con el código {process.returncode} (¿está instalado?)')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('gunicorn no aceptó conexiones en 30 segundos')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    common.add_dataset_arguments(parser)
+    parser.add_argument('--admins', type=int, default=2, help='administradores conectados durante el día')
+    parser.add_argument('--duration', type=float, default=60,
+                        help='segundos reales en que se comprime el día (0: sin esperas)')
+    parser.add_argument('--clock-in', choices=['events', 'workday'], default='events',
+                        help='fichar con POST /workday/<fecha>/events (app.js) o con POST /workday')
+    parser.add_argument('--seed', type=int, default=1, help='semilla de los guiones')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help='arrancar gunicorn con WORKERS workers')
+    target.add_argument('--url', help='servidor ya arrancado (base de datos preparada con --seed-only)')
+    target.add_argument('--seed-only', action='store_true',
+                        help='solo crear la base de datos de prueba e imprimir su ruta')
+    parser.add_argument('--gunicorn-threads', type=int, default=4, help='hilos por worker de gunicorn')
+    parser.add_argument('--save', nargs='?', const='', metavar='FICHERO',
+                        help='guardar los resultados (por defecto en benchmarks/results/)')
+    args = parser.parse_args(argv)
+
+    days = common.dataset_days(args)
+    dnis = common.user_dnis(args.users)
+    flask_app = None
+    process = None
+    if args.url:
+        base_url = args.url
+    else:
+        _database, app, dnis, path = common.prepare_database('load', args.users, days)
+        if args.seed_only:
+            print(path)
+            return
+        flask_app = app.app
+        if args.gunicorn:
+            process, base_url = start_gunicorn(path, args.gunicorn, args.gunicorn_threads)
+
+    def new_client():
+        return InProcessClient(flask_app) if flask_app and not process else HttpClient(base_url)
+
+    rng = random.Random(args.seed)
+    day = datetime.date.today()
+    users = []
+    for dni in dnis:
+        user = VirtualUser(dni, new_client())
+        employee_script(user, day, rng, args.clock_in)
+        users.append(user)
+    for _ in range(args.admins):
+        user = VirtualUser(common.ADMIN_DNI, new_client())
+        admin_script(user, day, rng)
+        users.append(user)
+
+    try:
+        recorder, wall_seconds = replay_day(users, args.duration)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if args.gunicorn:
+        target_name = f'gunicorn {args.gunicorn}x{args.gunicorn_threads}'
+    else:
+        target_name = args.url or 'en proceso'
+    results = recorder.results(wall_seconds)
+    common.print_table(f'Día simulado ({args.users} usuarios, {args.admins} admins, {target_name}, '
+                       f'{wall_seconds:.1f} s) - ms', results)
+    lag = common.summarize(recorder.lag)
+    print(f"\nRetraso respecto al guion: p50 {lag['p50_ms']:.1f} ms, p99 {lag['p99_ms']:.1f} ms")
+    if args.save is not None:
+        config = {'users': args.users, 'days': days, 'admins': args.admins, 'duration': args.duration,
+                  'clock_in': args.clock_in, 'seed': args.seed, 'target': target_name,
+                  'wall_seconds': round(wall_seconds, 3), 'schedule_lag': lag}
+        print(f"Resultados guardados en {common.save_results('load', config, results, args.save or None)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Micro-benchmarks de las funciones de acceso a datos de database.py.
+
+Crea una base de datos temporal con --users usuarios y --years años de jornadas y mide cada
+función por separado, llamándola --repeat veces con usuarios y fechas distintos (las
+lecturas de todos los usuarios, --heavy-repeat veces). Las escrituras se miden al final para
+que no alteren los datos de las lecturas. Informa de la latencia (media y p50/p95/p99) y de
+las operaciones por segundo, y con --save guarda los resultados para benchmarks.compare.
+
+Uso (desde backend/):
+    python -m benchmarks.micro --users 200 --years 2 --repeat 200
+    python -m benchmarks.micro --only get_workdays_page --save
+"""
+import argparse
+import datetime
+import hashlib
+import random
+import time
+
+from benchmarks import common
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def build_cases(database, dnis, today, heavy_repeat):
+    """
+    Devuelve la lista de casos [(nombre, función(n), repeticiones o None)] en el orden en
+    que se ejecutan; None usa --repeat. Cada función recibe el número de iteración.
+    """
+    rng = random.Random(42)
+    user = lambda n: dnis[n % len(dnis)]
+    recent = today - datetime.timedelta(days=1)
+    week_from = (today - datetime.timedelta(days=today.weekday())).isoformat()
+    month_from = _month_start(today).isoformat()
+    year_from = today.replace(month=1, day=1).isoformat()
+    month_key = database.period_keys(today.isoformat())['month']
+    tokens = [hashlib.sha256(f'bench-{dni}'.encode()).hexdigest() for dni in dnis]
+    expires_at = int((time.time() + 3600) * 1000)
+    pages = {}
+
+    def page_after(n):
+        # Recorre las páginas una tras otra, volviendo a empezar al llegar al final
+        rows, next_key = database.get_workdays_page(limit=100, after=pages.get('after'), include_events=False)
+        pages['after'] = next_key
+        return rows
+
+    def clock_event(n):
+        # Evento real del día: inicio, pausa, vuelta y fin, rotando por los usuarios
+        day_user = user(n)
+        step = (n // len(dnis)) % 4
+        name = ('Jornada Iniciada', 'Pausa Iniciada', 'Pausa Finalizada', 'Jornada Finalizada')[step]
+        event_time = int(time.time() * 1000) + n
+        duration = 15 * 60 * 1000 if name == 'Pausa Finalizada' else None
+        return database.append_workday_event(day_user, today.isoformat(), name, event_time, duration)
+
+    def save_full(n):
+        payload = common.make_events(today, rng)
+        return database.save_workday(user(n), payload)
+
+    def delete_recent(n):
+        # Borra días laborables recientes distintos en cada iteración
+        day = recent - datetime.timedelta(days=n // len(dnis))
+        return database.delete_workday(user(n), day.isoformat())
+
+    sample_events = common.make_events(today, rng)['events']
+    encoded = database.encode_events(sample_events)
+    read_cases = [
+        ('get_user', lambda n: database.get_user(user(n), 'pass'), None),
+        ('get_all_users', lambda n: database.get_all_users(), heavy_repeat),
+        ('create_session', lambda n: database.create_session(user(n), tokens[n % len(tokens)] + str(n), expires_at), None),
+        ('get_session', lambda n: database.get_session(tokens[0] + '0'), None),
+        ('get_data_version', lambda n: database.get_data_version(user(n)), None),
+        ('get_data_versions_since', lambda n: database.get_data_versions_since(0), heavy_repeat),
+        ('get_workday', lambda n: database.get_workday(user(n), recent.isoformat()), None),
+        ('get_all_workdays_for_user', lambda n: database.get_all_workdays_for_user(user(n)), None),
+        ('get_all_workdays_for_user events=0', lambda n: database.get_all_workdays_for_user(user(n), include_events=False), None),
+        ('get_all_workdays_for_user semana', lambda n: database.get_all_workdays_for_user(
+            user(n), week_from, today.isoformat(), include_events=False), None),
+        ('get_all_workdays_for_user mes raw', lambda n: database.get_all_workdays_for_user(
+            user(n), month_from, today.isoformat(), False, True), None),
+        ('get_workdays_page', lambda n: database.get_workdays_page(limit=100), None),
+        ('get_workdays_page after', page_after, None),
+        ('get_workdays_page usuario', lambda n: database.get_workdays_page(user(n), limit=100), None),
+        ('get_workdays_page rango', lambda n: database.get_workdays_page(
+            date_from=month_from, date_to=today.isoformat(), limit=100, include_events=False), None),
+        ('get_open_workdays', lambda n: database.get_open_workdays(today.isoformat()), None),
+        ('get_workday_summary week', lambda n: database.get_workday_summary('week', user(n)), None),
+        ('get_workday_summary month', lambda n: database.get_workday_summary('month', user(n)), None),
+        ('get_workday_summary year', lambda n: database.get_workday_summary('year', user(n)), None),
+        ('get_workday_summary empresa', lambda n: database.get_workday_summary(
+            'month', None, month_key, month_key, by_user=False), None),
+        ('get_workday_summary todos', lambda n: database.get_workday_summary('month', None, month_key, month_key), None),
+        ('iter_workdays usuario', lambda n: sum(1 for _ in database.iter_workdays(user(n))), None),
+        ('iter_workdays año', lambda n: sum(1 for _ in database.iter_workdays(
+            date_from=year_from, include_events=False)), heavy_repeat),
+        ('get_all_workdays_all_users', lambda n: database.get_all_workdays_all_users(), heavy_repeat),
+        ('get_all_workdays_all_users events=0', lambda n: database.get_all_workdays_all_users(False), heavy_repeat),
+        ('encode_events', lambda n: database.encode_events(sample_events), None),
+        ('decode_events', lambda n: database.decode_events(encoded), None),
+    ]
+    write_cases = [
+        ('append_workday_event', clock_event, None),
+        ('save_workday', save_full, None),
+        ('update_user', lambda n: database.update_user(user(n), new_role='user'), None),
+        ('delete_session', lambda n: database.delete_session(tokens[n % len(tokens)] + str(n)), None),
+        ('delete_workday', delete_recent, None),
+        ('rebuild_summaries', lambda n: _rebuild_summaries(database), heavy_repeat),
+    ]
+    return read_cases + write_cases
+
+
+def _rebuild_summaries(database):
+    with database.write_transaction(database.get_connection()) as conn:
+        database.rebuild_summaries(conn)
+
+
+def run_case(func, repeat):
+    samples = []
+    errors = 0
+    start = time.perf_counter()
+    for n in range(repeat):
+        began = time.perf_counter()
+        try:
+            func(n)
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    stats = common.summarize(samples)
+    stats['errors'] = errors
+    stats['throughput_rps'] = repeat / elapsed if elapsed else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    common.add_dataset_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=200, help='llamadas por función')
+    parser.add_argument('--heavy-repeat', type=int, default=5,
+                        help='llamadas de las funciones que leen todos los usuarios')
+    parser.add_argument('--only', action='append', help='ejecutar solo los casos cuyo nombre contiene este texto')
+    parser.add_argument('--save', nargs='?', const='', metavar='FICHERO',
+                        help='guardar los resultados (por defecto en benchmarks/results/)')
+    args = parser.parse_args(argv)
+
+    days = common.dataset_days(args)
+    database, _app, dnis, _path = common.prepare_database('micro', args.users, days)
+    today = datetime.date.today()
+    results = {}
+    for name, func, repeat in build_cases(database, dnis, today, args.heavy_repeat):
+        if args.only and not any(text in name for text in args.only):
+            continue
+        results[name] = run_case(func, repeat or args.repeat)
+    database.close_connections()
+
+    common.print_table(f'database.py ({args.users} usuarios, {days} días por usuario) - ms', results)
+    if args.save is not None:
+        config = {'users': args.users, 'days': days, 'repeat': args.repeat, 'heavy_repeat': args.heavy_repeat}
+        print(f"\nResultados guardados en {common.save_results('micro', config, results, args.save or None)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Formato columnar y compresión de las respuestas de los listados de jornadas.
+
+En lugar de una lista de objetos que repiten las claves en cada jornada, el formato columnar
+envía una lista de valores por columna, todas de la misma longitud:
+
+    {"format": "columns", "count": 2,
+     "strings": {"user_dni": ["12345678A"], "event": ["Jornada Iniciada", ...]},
+     "columns": {"user_dni": [0, 0], "date": [...], "start_time": [...], "end_time": [...],
+                 "total_break_duration": [...], "events": [[[0, 1718000000000, null], ...], ...]}}
+
+Los DNI y los tipos de evento se envían una vez en `strings` y las columnas guardan su
+índice; cada evento es [tipo, time, duration] (o [tipo, time] si no tenía duración). Los
+eventos con otras claves se envían como objeto. El cliente lo pide con ?format=columns o
+con la cabecera Accept: MEDIA_TYPE; app.js lo convierte de nuevo en la lista de jornadas.
+
+Las respuestas de los listados que superan COMPRESS_MIN_BYTES se comprimen con brotli (si
+el paquete está instalado y el cliente lo acepta) o con gzip.
+"""
+import gzip
+import json
+import os
+
+import database
+
+try:
+    import brotli
+except ImportError: # Opcional: sin el paquete brotli se comprime solo con gzip
+    brotli = None
+
+MEDIA_TYPE = 'application/vnd.workday.columns+json'
+# Respuestas más pequeñas no compensan el coste de comprimir
+COMPRESS_MIN_BYTES = int(os.environ.get('WORKDAY_COMPRESS_MIN_BYTES', 1024))
+# Niveles rápidos: se comprime en cada petición y los niveles altos apenas reducen más el JSON
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+_EVENT_KEYS = {'event', 'time', 'duration'}
+
+
+def wants_columns(request):
+    """True si la petición pide el formato columnar (?format=columns o Accept: MEDIA_TYPE)."""
+    if request.args.get('format') == 'columns':
+        return True
+    return any(value == MEDIA_TYPE and quality > 0 for value, quality in request.accept_mimetypes)
+
+
+class _StringTable:
+    """Asigna a cada texto distinto un índice en el orden en que aparece."""
+
+    def __init__(self):
+        self.indexes = {}
+        self.values = []
+
+    def index(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def _encode_events(events, event_names):
+    encoded = []
+    for event in events:
+        if isinstance(event, dict) and event.keys() <= _EVENT_KEYS and isinstance(event.get('event'), str):
+            item = [event_names.index(event['event']), event.get('time')]
+            if 'duration' in event:
+                item.append(event['duration'])
+            encoded.append(item)
+        else:
+            encoded.append(event)
+    return encoded
+
+
+def encode_workdays(rows):
+    """
+    Convierte filas de workdays (tuplas en el orden de database.WORKDAY_COLUMNS, con o sin
+    eventos, como las devuelven las lecturas con raw=True) en el payload columnar.
+    """
+    dnis = _StringTable()
+    columns = {
+        'user_dni': [dnis.index(row[0]) for row in rows],
+        'date': [row[1] for row in rows],
+        'start_time': [row[2] for row in rows],
+        'end_time': [row[3] for row in rows],
+        'total_break_duration': [row[4] for row in rows],
+    }
+    strings = {'user_dni': dnis.values}
+    if rows and len(rows[0]) > 5:
+        event_names = _StringTable()
+        columns['events'] = [_encode_events(database.decode_events(row[5]), event_names) for row in rows]
+        strings['event'] = event_names.values
+    return {'format': 'columns', 'count': len(rows), 'strings': strings, 'columns': columns}
+
+
+def dumps(payload):
+    """Serializa el payload columnar sin espacios."""
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def compress_response(request, response):
+    """
+    Comprime el cuerpo de una respuesta 200 si supera COMPRESS_MIN_BYTES y el cliente acepta
+    br o gzip. Las respuestas en streaming o ya comprimidas no se tocan.
+    """
+    if response.status_code != 200 or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -1,114 +1,634 @@
 import sqlite3
+import contextlib
+import datetime
+import functools
 import hashlib
+import heapq
+import itertools
+import json
+import logging
+import argparse
 import os # Importar os para manejo de rutas
-import sys # Importar sys para depuración
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import weakref
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import event_codec
+import metrics
+import write_queue
 
 # Define la ruta absoluta al directorio de tu base de datos
 # Asumiendo que workday.db estará en /var/www/proyecto/backend/instance/
+# La variable de entorno WORKDAY_DATABASE permite apuntar a otro fichero (pruebas, benchmarks).
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE_DIR = os.path.join(BASE_DIR, 'instance')
-DATABASE_NAME = os.path.join(DATABASE_DIR, 'workday.db')
+DATABASE_NAME = os.environ.get('WORKDAY_DATABASE') or os.path.join(BASE_DIR, 'instance', 'workday.db')
+DATABASE_DIR = os.path.dirname(DATABASE_NAME)
 
-# --- DEBUGGING TEMPORAL ---
-# Estas líneas imprimirán la ruta de la base de datos en los logs de Apache
-print(f"DATABASE_DIR: {DATABASE_DIR}", file=sys.stderr)
-print(f"DATABASE_NAME: {DATABASE_NAME}", file=sys.stderr)
-print(f"Current working directory (from database.py): {os.getcwd()}", file=sys.stderr)
-# --- FIN DEBUGGING TEMPORAL ---
+# --- Ajustes de SQLite ---
+# Tiempo máximo que una conexión espera a que se libere el bloqueo de escritura
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('WORKDAY_DB_BUSY_TIMEOUT_MS', 5000))
+# Tamaño de la caché de páginas por conexión (en KiB)
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('WORKDAY_DB_CACHE_SIZE_KB', 8192))
+# Bytes del fichero que se leen mediante mmap (0 lo desactiva)
+SQLITE_MMAP_SIZE = int(os.environ.get('WORKDAY_DB_MMAP_SIZE', 64 * 1024 * 1024))
 
-def init_db():
-    """Inicializa la base de datos y crea las tablas si no existen."""
-    # Asegurarse de que el directorio 'instance' exista
-    os.makedirs(DATABASE_DIR, exist_ok=True)
+# --- Escritura agrupada (group commit) ---
+# Si está activa, save_workday/append_workday_event/delete_workday concurrentes dentro de un
+# worker se confirman juntas en una transacción cada WRITE_BATCH_MAX_DELAY_MS o WRITE_BATCH_MAX_ITEMS.
+WRITE_BATCHING = os.environ.get('WORKDAY_WRITE_BATCHING', '0') == '1'
+WRITE_BATCH_MAX_ITEMS = int(os.environ.get('WORKDAY_WRITE_BATCH_MAX_ITEMS', 64))
+WRITE_BATCH_MAX_DELAY_MS = float(os.environ.get('WORKDAY_WRITE_BATCH_MAX_DELAY_MS', 5))
+# Espera máxima de una escritura encolada hasta su commit (debe superar SQLITE_BUSY_TIMEOUT_MS)
+WRITE_BATCH_TIMEOUT_MS = float(os.environ.get('WORKDAY_WRITE_BATCH_TIMEOUT_MS', 30000))
+
+# --- Particionado de las jornadas (sharding) ---
+# Con WORKDAY_DB_SHARDS=N (N > 0) las tablas de jornadas de cada usuario (workdays,
+# workday_summaries, workday_versions) se guardan en uno de N ficheros SQLite, elegido por un
+# hash estable de su DNI; la tabla users sigue en DATABASE_NAME. Cada fichero tiene su propio
+# bloqueo de escritura, así que las escrituras de usuarios de particiones distintas no se
+# esperan entre sí. Con 0 (por defecto) todo se guarda en DATABASE_NAME.
+# Para cambiar N hay que mover los datos con `python database.py reshard --shards N`.
+DATABASE_SHARDS = int(os.environ.get('WORKDAY_DB_SHARDS', 0))
+
+def shard_paths(shards=None):
+    """Ficheros que guardan las jornadas con `shards` particiones (por defecto DATABASE_SHARDS)."""
+    shards = DATABASE_SHARDS if shards is None else shards
+    if shards <= 0:
+        return [DATABASE_NAME]
+    root, ext = os.path.splitext(DATABASE_NAME)
+    return [f"{root}-shard{index:02d}{ext}" for index in range(shards)]
+
+def shard_index(user_dni, shards):
+    """Partición de un DNI. blake2b no depende de PYTHONHASHSEED, así que es estable entre procesos."""
+    digest = hashlib.blake2b(user_dni.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+def workday_database(user_dni, shards=None):
+    """Fichero que guarda las jornadas de un usuario."""
+    paths = shard_paths(shards)
+    return paths[shard_index(user_dni, len(paths))]
+
+# --- Gestión de conexiones ---
+# Cada hilo de cada worker mantiene una única conexión abierta que se reutiliza
+# entre peticiones, en lugar de abrir y cerrar una por cada llamada.
+class _ThreadConnections(dict):
+    """Conexiones persistentes de un hilo: fichero -> conexión."""
+
+_local = threading.local()
+# Conexiones de los hilos vivos de este proceso, con referencias débiles: cuando termina un
+# hilo (el servidor de desarrollo y gevent usan uno por petición) se libera su diccionario y
+# con él se cierran sus conexiones, en lugar de quedarse abiertas aquí
+_connections = weakref.WeakValueDictionary() # id -> _ThreadConnections
+_connections_lock = threading.Lock()
+# Conexiones heredadas del proceso padre tras un fork: no deben cerrarse en el hijo
+_inherited_connections = []
+
+def _configure_connection(conn, foreign_keys=True):
+    """Aplica los PRAGMA de rendimiento y consistencia a una conexión nueva."""
+    # WAL permite lectores concurrentes con un escritor y evita los 'database is locked'
+    conn.execute("PRAGMA journal_mode = WAL")
+    # Con WAL, NORMAL solo sincroniza en los checkpoints y sigue siendo seguro ante caídas de la app
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    # Las particiones no tienen la tabla users con datos: sus claves ajenas no se comprueban
+    conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+
+def connect(path=None):
+    """
+    Abre una conexión nueva y configurada a DATABASE_NAME o a `path` (una partición).
+    Quien la abre es responsable de cerrarla.
+    """
+    path = path or DATABASE_NAME
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Nombres en forma de URI para poder adjuntar los archivos en solo lectura (ATTACH 'file:...?mode=ro')
+    conn = sqlite3.connect(_sqlite_uri(path), uri=True, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    _configure_connection(conn, foreign_keys=(path == DATABASE_NAME))
+    return conn
+
+def _sqlite_uri(path, read_only=False):
+    uri = 'file:' + urllib.parse.quote(os.path.abspath(path))
+    return uri + '?mode=ro' if read_only else uri
+
+def get_connection(path=None):
+    """
+    Devuelve la conexión persistente del hilo actual a DATABASE_NAME (o a la partición
+    `path`), abriéndola si hace falta. Se vuelven a abrir si el proceso es un fork
+    (p. ej. workers de gunicorn con preload), porque una conexión SQLite no debe
+    compartirse entre procesos.
+    """
+    path = path or DATABASE_NAME
+    if getattr(_local, 'pid', None) != os.getpid():
+        if getattr(_local, 'conns', None):
+            _inherited_connections.append(_local.conns)
+        _local.conns = _ThreadConnections()
+        _local.pid = os.getpid()
+        with _connections_lock:
+            _connections[id(_local.conns)] = _local.conns
+    conn = _local.conns.get(path)
+    if conn is not None:
+        return conn
+
+    conn = _local.conns[path] = connect(path)
+    return conn
+
+@contextlib.contextmanager
+def write_transaction(conn=None):
+    """
+    Transacción de escritura que toma el bloqueo al empezar (BEGIN IMMEDIATE), de modo que
+    las lecturas previas a la escritura (p. ej. el estado anterior de una jornada) no
+    puedan quedar obsoletas por otro escritor. Hace commit al salir o rollback si hay error.
+    """
+    conn = conn or get_connection()
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE") # Espera aquí (hasta busy_timeout) si otro proceso está escribiendo
+    metrics.observe_lock_wait(time.perf_counter() - started)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+# Una cola por fichero de jornadas: cada una agrupa las escrituras que comparten bloqueo.
+# El hilo de cada cola solo arranca con su primera escritura.
+_write_queues = {
+    path: write_queue.WriteQueue(functools.partial(connect, path), WRITE_BATCH_MAX_ITEMS,
+                                 WRITE_BATCH_MAX_DELAY_MS, WRITE_BATCH_TIMEOUT_MS)
+    for path in shard_paths()
+}
+
+def run_write(func, user_dni, *args):
+    """
+    Ejecuta func(conn, user_dni, *args) en una transacción de escritura sobre el fichero que
+    guarda las jornadas de user_dni y devuelve su resultado.
+    Con WRITE_BATCHING la escritura se agrupa con otras concurrentes en la cola de escritura.
+    """
+    path = workday_database(user_dni)
+    if WRITE_BATCHING:
+        return _write_queues[path].submit(func, user_dni, *args)
+    with write_transaction(get_connection(path)) as conn:
+        return func(conn, user_dni, *args)
+
+def write_queue_stats():
+    """Métricas de la cola de escritura agrupada, sumando las de todas las particiones (None si está desactivada)."""
+    if not WRITE_BATCHING:
+        return None
+    all_stats = [queue.stats() for queue in _write_queues.values()]
+    stats = dict(all_stats[0])
+    for other in all_stats[1:]:
+        for key in ('batches', 'items', 'errors', 'queue_depth', 'flush_seconds_total', 'wait_seconds_total'):
+            stats[key] += other[key]
+        for key in ('last_batch_size', 'max_batch_size', 'flush_seconds_max', 'wait_seconds_max'):
+            stats[key] = max(stats[key], other[key])
+    stats['queues'] = len(all_stats)
+    return stats
+
+def _write_queue_gauge(key, documentation):
+    metrics.register(metrics.Gauge(f'workday_write_queue_{key}', documentation,
+                                   lambda: (write_queue_stats() or {}).get(key)))
+
+_write_queue_gauge('batches', 'Lotes confirmados por la cola de escritura.')
+_write_queue_gauge('items', 'Escrituras confirmadas por la cola de escritura.')
+_write_queue_gauge('errors', 'Escrituras de la cola que terminaron en error.')
+_write_queue_gauge('last_batch_size', 'Tamaño del último lote confirmado.')
+_write_queue_gauge('max_batch_size', 'Tamaño máximo de lote observado.')
+_write_queue_gauge('queue_depth', 'Escrituras pendientes en la cola.')
+_write_queue_gauge('flush_seconds_total', 'Tiempo total confirmando lotes (segundos).')
+_write_queue_gauge('flush_seconds_max', 'Mayor duración de confirmación de un lote (segundos).')
+_write_queue_gauge('wait_seconds_total', 'Tiempo total de espera de las escrituras hasta su commit (segundos).')
+_write_queue_gauge('wait_seconds_max', 'Mayor espera de una escritura hasta su commit (segundos).')
+
+def close_connections():
+    """Cierra todas las conexiones persistentes de este proceso (apagado, pruebas, benchmarks)."""
+    with _connections_lock:
+        for conns in list(_connections.values()):
+            for conn in conns.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            conns.clear()
+        _connections.clear()
+    _local.__dict__.clear()
+
+_fan_out_pool = None
+_fan_out_pid = None
+_fan_out_lock = threading.Lock()
+
+def _fan_out(func):
+    """
+    Ejecuta func(path) para cada fichero de jornadas y devuelve la lista de resultados en el orden
+    de shard_paths(). Con varias particiones las consultas se lanzan en paralelo en un pool de
+    hilos (sqlite3 libera el GIL mientras SQLite trabaja); cada hilo usa sus conexiones persistentes.
+    """
+    global _fan_out_pool, _fan_out_pid
+    paths = shard_paths()
+    if len(paths) == 1:
+        return [func(paths[0])]
+    if _fan_out_pid != os.getpid():
+        # Un pool creado antes de un fork no tiene hilos en el proceso hijo
+        with _fan_out_lock:
+            if _fan_out_pid != os.getpid():
+                _fan_out_pool = ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix='workday-shards')
+                _fan_out_pid = os.getpid()
+    return list(_fan_out_pool.map(func, paths))
+
+def _merge_by_user(results, key=lambda row: row[0]):
+    """
+    Mezcla resultados de varias particiones ordenados por user_dni. Todas las filas de un
+    usuario están en la misma partición, así que su orden interno (p. ej. fecha) se conserva.
+    Con claves iguales heapq.merge respeta el orden de `results`, lo que permite mezclar
+    también los orígenes (archivos por año) de un mismo fichero.
+    """
+    return heapq.merge(*results, key=key)
+
+
+# --- Archivo de años cerrados ---
+# `python database.py archive --before AAAA` mueve las jornadas anteriores al año AAAA de cada
+# fichero de jornadas a un fichero por año en ARCHIVE_DIR (archive/workday-2019.db o, con
+# particiones, archive/workday-shard02-2019.db), compactado y con los eventos comprimidos.
+# Las consultas adjuntan en solo lectura (ATTACH) los archivos de los años que alcanza su rango
+# de fechas; las que se limitan a fechas recientes solo leen la tabla principal.
+# Todos los años hasta el último archivado se consideran cerrados: se leen solo de los archivos
+# y no admiten escrituras.
+ARCHIVE_DIR = os.path.join(DATABASE_DIR, 'archive')
+# Archivos adjuntos a la vez en una conexión (SQLite admite 10 bases de datos adjuntas por defecto)
+MAX_ATTACHED_ARCHIVES = 8
+ARCHIVE_COMPRESSION_LEVEL = 9
+
+class ArchivedDateError(ValueError):
+    """Escritura sobre una fecha de un año archivado."""
+
+_archive_years_cache = {} # fichero de jornadas -> (mtime de ARCHIVE_DIR, años archivados)
+
+def archive_path(path, year):
+    """Fichero de archivo del año `year` para el fichero de jornadas `path`."""
+    root, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(ARCHIVE_DIR, f"{root}-{year}{ext}")
+
+def archive_years(path):
+    """
+    Años archivados del fichero de jornadas `path`, ordenados. La lista se guarda en caché
+    hasta que cambia el contenido de ARCHIVE_DIR, así que cada consulta solo cuesta un stat().
+    """
+    try:
+        mtime = os.stat(ARCHIVE_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _archive_years_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    root, ext = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(re.escape(root) + r'-(\d{4})' + re.escape(ext))
+    years = sorted(int(match.group(1)) for match in map(pattern.fullmatch, os.listdir(ARCHIVE_DIR)) if match)
+    _archive_years_cache[path] = (mtime, years)
+    return years
+
+def _hot_from(years):
+    """Primera fecha que se lee de la tabla principal cuando hay años archivados."""
+    return f"{years[-1] + 1}-01-01"
+
+def is_archived(path, date):
+    """True si la fecha pertenece a un año cerrado (archivado) del fichero de jornadas `path`."""
+    years = archive_years(path)
+    return bool(years) and date < _hot_from(years)
+
+def _check_writable(user_dni, date):
+    """Rechaza antes de encolar la escritura las fechas ya archivadas."""
+    if date and is_archived(workday_database(user_dni), date):
+        raise ArchivedDateError(f"El año {date[:4]} está archivado y no admite cambios")
+
+def _check_writable_locked(conn, date):
+    """
+    Repite la comprobación dentro de la transacción de escritura: una escritura que pasó
+    _check_writable mientras se archivaba su año obtiene el bloqueo después del borrado y
+    no debe dejar la jornada en la tabla principal, donde las lecturas de ese año no miran.
+    Además de la lista en caché se mira el fichero del año: el archivado lo crea en otro
+    proceso y puede caer en el mismo instante de mtime de ARCHIVE_DIR que la caché.
+    """
+    if not date:
+        return
+    path = _connection_path(conn)
+    if is_archived(path, date) or os.path.exists(archive_path(path, date[:4])):
+        raise ArchivedDateError(f"El año {date[:4]} está archivado y no admite cambios")
+
+def _connection_path(conn):
+    """Fichero principal de una conexión."""
+    return next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == 'main')
+
+def _workday_sources(path, date_from=None, date_to=None):
+    """
+    Orígenes de las jornadas de `path` que alcanza el rango [date_from, date_to], en orden de
+    fecha: lista de (año archivado, o None para la tabla principal, condiciones, parámetros).
+    La tabla principal solo se lee desde el año siguiente al último archivado, así que mientras
+    se archiva un año ninguna jornada aparece dos veces.
+    """
+    years = archive_years(path)
+    if not years:
+        return [(None, [], [])]
+    sources = [(year, [], []) for year in years
+               if (not date_from or date_from <= f"{year}-12-31") and (not date_to or date_to >= f"{year}-01-01")]
+    hot_from = _hot_from(years)
+    if not date_to or date_to >= hot_from:
+        sources.append((None, ["date >= ?"], [hot_from]))
+    return sources
+
+def _attach_archive(conn, path, year):
+    """Adjunta en solo lectura el archivo de `year` a la conexión si no lo estaba ya."""
+    schema = f"archive_{year}"
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if schema in attached:
+        return
+    archives = [name for name in attached if name.startswith('archive_')]
+    if len(archives) >= MAX_ATTACHED_ARCHIVES:
+        for name in archives:
+            conn.execute(f"DETACH DATABASE {name}")
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (_sqlite_uri(archive_path(path, year), read_only=True),))
+
+def _source_queries(path, columns, conditions, params, order, date_from=None, date_to=None, limit=None):
+    """Construye la consulta de cada origen de _workday_sources(): lista de (año o None, sql, parámetros)."""
+    queries = []
+    for year, extra_conditions, extra_params in _workday_sources(path, date_from, date_to):
+        where = conditions + extra_conditions
+        query = f"SELECT {columns} FROM {f'archive_{year}.workdays' if year else 'workdays'}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {order}"
+        query_params = list(params) + extra_params
+        if limit:
+            query += " LIMIT ?"
+            query_params.append(limit)
+        queries.append((year, query, query_params))
+    return queries
+
+def _select_workdays(path, columns, conditions, params, order, date_from=None, date_to=None, limit=None):
+    """Ejecuta la consulta en cada origen con la conexión persistente y devuelve una lista de filas por origen."""
+    conn = get_connection(path)
+    results = []
+    for year, query, query_params in _source_queries(path, columns, conditions, params, order, date_from, date_to, limit):
+        if year:
+            _attach_archive(conn, path, year)
+        results.append(conn.execute(query, query_params).fetchall())
+    return results
 
-    # --- DEBUGGING TEMPORAL ---
-    print(f"Attempting to connect to database: {DATABASE_NAME}", file=sys.stderr)
-    # --- FIN DEBUGGING TEMPORAL ---
+def compress_events(events):
+    """
+    Comprime el valor de la columna events para guardarlo en un archivo si es texto JSON;
+    el formato compacto (event_codec) se guarda tal cual.
+    """
+    if events is None or isinstance(events, bytes):
+        return events
+    return zlib.compress(events.encode('utf-8'), ARCHIVE_COMPRESSION_LEVEL)
 
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+# --- Esquema y migraciones ---
+# El esquema se versiona con PRAGMA user_version: cada migración se aplica una sola vez,
+# en orden, y deja user_version con su número. Para cambiar el esquema se añade una
+# migración nueva al final de MIGRATIONS; nunca se modifican las ya publicadas.
+# Las migraciones usan IF NOT EXISTS porque las bases de datos creadas antes de
+# versionar el esquema (user_version 0) ya tienen parte de las tablas.
 
+def _migration_base_tables(conn):
     # Tabla de usuarios
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS users (
-                                                        dni TEXT PRIMARY KEY,
-                                                        password TEXT NOT NULL,
-                                                        role TEXT DEFAULT 'user'
-                   )
-                   ''')
+    conn.execute('''
+                 CREATE TABLE IF NOT EXISTS users (
+                                                      dni TEXT PRIMARY KEY,
+                                                      password TEXT NOT NULL,
+                                                      role TEXT DEFAULT 'user'
+                 )
+                 ''')
 
     # Tabla de jornadas laborales
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS workdays (
-                                                           user_dni TEXT NOT NULL,
-                                                           date TEXT NOT NULL,
-                                                           start_time INTEGER,
-                                                           end_time INTEGER,
-                                                           total_break_duration INTEGER DEFAULT 0,
-                                                           events TEXT,
-                                                           PRIMARY KEY (user_dni, date),
-                       FOREIGN KEY (user_dni) REFERENCES users(dni) ON DELETE CASCADE
-                       )
-                   ''')
-
-    # Añadir usuarios de ejemplo si no existen
-    # Intentar añadir solo si no existen para evitar errores de integridad
+    conn.execute('''
+                 CREATE TABLE IF NOT EXISTS workdays (
+                                                         user_dni TEXT NOT NULL,
+                                                         date TEXT NOT NULL,
+                                                         start_time INTEGER,
+                                                         end_time INTEGER,
+                                                         total_break_duration INTEGER DEFAULT 0,
+                                                         events TEXT,
+                                                         PRIMARY KEY (user_dni, date),
+                     FOREIGN KEY (user_dni) REFERENCES users(dni) ON DELETE CASCADE
+                     )
+                 ''')
+
+def _migration_workday_indexes(conn):
+    create_workday_indexes(conn)
+
+def _migration_workday_summaries(conn):
+    # Totales agregados por usuario y periodo (semana ISO, mes, año), mantenidos
+    # por save_workday/delete_workday en la misma transacción que la jornada
+    conn.execute('''
+                 CREATE TABLE IF NOT EXISTS workday_summaries (
+                     granularity TEXT NOT NULL,
+                     period TEXT NOT NULL,
+                     user_dni TEXT NOT NULL,
+                     days INTEGER NOT NULL DEFAULT 0,
+                     work_ms INTEGER NOT NULL DEFAULT 0,
+                     break_ms INTEGER NOT NULL DEFAULT 0,
+                     PRIMARY KEY (granularity, period, user_dni),
+                     FOREIGN KEY (user_dni) REFERENCES users(dni) ON DELETE CASCADE
+                 )
+                 ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workday_summaries_user ON workday_summaries (user_dni, granularity, period)")
+    # Calcular los agregados de las jornadas ya existentes
+    rebuild_summaries(conn)
+
+def _migration_workday_versions(conn):
+    # Versión de los datos de cada usuario: la incrementa cada escritura de sus jornadas
+    # y sirve de ETag en las lecturas sin consultar la tabla workdays
+    conn.execute('''
+                 CREATE TABLE IF NOT EXISTS workday_versions (
+                     user_dni TEXT PRIMARY KEY,
+                     version INTEGER NOT NULL DEFAULT 0,
+                     updated_at INTEGER,
+                     FOREIGN KEY (user_dni) REFERENCES users(dni) ON DELETE CASCADE
+                 )
+                 ''')
+
+MIGRATION_BATCH_SIZE = 5000
+
+def _migration_compact_events(conn):
+    # Pasar los eventos guardados como texto JSON al formato compacto (event_codec), por lotes
+    # de rowid para no cargar la tabla en memoria. El espacio liberado se recupera con VACUUM.
+    last_rowid = 0
+    while True:
+        rows = conn.execute('''
+            SELECT rowid, events FROM workdays
+            WHERE rowid > ? AND typeof(events) = 'text' ORDER BY rowid LIMIT ?
+        ''', (last_rowid, MIGRATION_BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        updates = []
+        for rowid, value in rows:
+            try:
+                events = encode_events(json.loads(value))
+            except ValueError:
+                continue # Texto que no es JSON: se deja como está
+            if isinstance(events, bytes):
+                updates.append((events, rowid))
+        conn.executemany("UPDATE workdays SET events = ? WHERE rowid = ?", updates)
+
+def _migration_sessions(conn):
+    # Sesiones abiertas con /login. Se guarda el hash del token, nunca el token
+    conn.execute('''
+                 CREATE TABLE IF NOT EXISTS sessions (
+                     token_hash TEXT PRIMARY KEY,
+                     user_dni TEXT NOT NULL,
+                     expires_at INTEGER NOT NULL,
+                     FOREIGN KEY (user_dni) REFERENCES users(dni) ON DELETE CASCADE
+                 )
+                 ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_dni)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+# (versión, descripción, función). Las versiones son consecutivas empezando en 1.
+MIGRATIONS = [
+    (1, 'Tablas users y workdays', _migration_base_tables),
+    (2, 'Índices secundarios de workdays', _migration_workday_indexes),
+    (3, 'Agregados workday_summaries', _migration_workday_summaries),
+    (4, 'Versiones de datos workday_versions', _migration_workday_versions),
+    (5, 'Eventos en formato compacto', _migration_compact_events),
+    (6, 'Sesiones de usuario', _migration_sessions),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(path=None):
+    """
+    Versión del esquema de la base de datos (0 si no existe o no está versionada).
+    Es una única lectura de la cabecera del fichero, sin configurar la conexión.
+    """
+    path = path or DATABASE_NAME
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
     try:
-        add_user('12345678A', 'pass', 'user', conn=conn)
-        add_user('admin', 'adminpass', 'admin', conn=conn)
-    except sqlite3.IntegrityError:
-        pass # Los usuarios ya existen, no hacer nada
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+def database_paths():
+    """Todos los ficheros de la base de datos: DATABASE_NAME y, si hay particiones, cada una de ellas."""
+    return [DATABASE_NAME] + (shard_paths() if DATABASE_SHARDS else [])
+
+def migrate(path=None):
+    """
+    Aplica las migraciones pendientes a DATABASE_NAME (o a la partición `path`) y devuelve
+    la lista de versiones aplicadas. Las particiones tienen el mismo esquema; sus tablas
+    users quedan vacías.
+    Cada migración se ejecuta en su propia transacción BEGIN IMMEDIATE junto con el cambio
+    de user_version, así que si varios procesos arrancan a la vez solo uno la aplica: el
+    resto espera al bloqueo, vuelve a leer la versión y la encuentra ya aplicada.
+    """
+    applied = []
+    conn = connect(path)
+    try:
+        for version, description, migration in MIGRATIONS:
+            with write_transaction(conn):
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= version:
+                    continue
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+def init_db():
+    """
+    Deja el esquema de la base de datos al día. Se llama al arrancar cada worker: si el
+    esquema ya está en SCHEMA_VERSION solo cuesta leer PRAGMA user_version de cada fichero.
+    No crea usuarios; los de ejemplo se añaden con `python database.py seed`.
+    """
+    applied = []
+    for path in database_paths():
+        if schema_version(path) < SCHEMA_VERSION:
+            applied.extend(migrate(path))
+    return applied
+
+# Índices secundarios de workdays (la importación masiva los elimina y los vuelve a crear al final)
+WORKDAY_INDEXES = {
+    # Listar jornadas en el orden del panel de administración (user_dni ascendente,
+    # fecha descendente) y paginar por clave sin ordenar en memoria
+    'idx_workdays_user_date_desc': "CREATE INDEX IF NOT EXISTS idx_workdays_user_date_desc ON workdays (user_dni, date DESC)",
+    # Filtrar por rango de fechas sin DNI
+    'idx_workdays_date': "CREATE INDEX IF NOT EXISTS idx_workdays_date ON workdays (date)",
+}
+
+def create_workday_indexes(conn):
+    """Crea los índices secundarios de workdays que falten (sin commit)."""
+    for statement in WORKDAY_INDEXES.values():
+        conn.execute(statement)
+
+def drop_workday_indexes(conn):
+    """Elimina los índices secundarios de workdays (sin commit)."""
+    for name in WORKDAY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
 
 def hash_password(password):
     """Hashea una contraseña usando SHA256."""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def add_user(dni, password, role='user', conn=None):
-    """Añade un nuevo usuario a la base de datos. Permite pasar una conexión existente."""
-    if conn is None:
-        conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    """
+    Añade un nuevo usuario a la base de datos. Permite pasar una conexión existente;
+    en ese caso el commit queda en manos de quien la pasó.
+    """
     hashed_password = hash_password(password)
+    query = "INSERT INTO users (dni, password, role) VALUES (?, ?, ?)"
     try:
-        cursor.execute("INSERT INTO users (dni, password, role) VALUES (?, ?, ?)", (dni, hashed_password, role))
-        if conn is not None: # Solo commitear si la conexión es local
-            conn.commit()
+        if conn is not None:
+            conn.execute(query, (dni, hashed_password, role))
+        else:
+            with get_connection() as conn:
+                conn.execute(query, (dni, hashed_password, role))
         return True
     except sqlite3.IntegrityError:
         # El DNI ya existe
         return False
-    finally:
-        if conn is None: # Solo cerrar si la conexión fue abierta aquí
-            conn.close()
 
 def get_user(dni, password):
     """Obtiene un usuario por DNI y contraseña."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    conn = get_connection()
     hashed_password = hash_password(password)
-    cursor.execute("SELECT dni, role FROM users WHERE dni = ? AND password = ?", (dni, hashed_password))
-    user = cursor.fetchone()
-    conn.close()
+    user = conn.execute("SELECT dni, role FROM users WHERE dni = ? AND password = ?", (dni, hashed_password)).fetchone()
     if user:
         return {'dni': user[0], 'role': user[1]}
     return None
 
 def get_all_users():
     """Obtiene todos los usuarios (sin contraseñas)."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT dni, role FROM users")
-    users = [{'dni': row[0], 'role': row[1]} for row in cursor.fetchall()]
-    conn.close()
-    return users
+    conn = get_connection()
+    return [{'dni': row[0], 'role': row[1]} for row in conn.execute("SELECT dni, role FROM users")]
+
+# Funciones listener(dni) a las que se avisa tras modificar o eliminar un usuario en este
+# proceso (p. ej. la caché de sesiones de auth.py)
+_user_listeners = []
+
+def add_user_listener(listener):
+    _user_listeners.append(listener)
+
+def _notify_user_change(dni):
+    for listener in _user_listeners:
+        try:
+            listener(dni)
+        except Exception:
+            logging.getLogger(__name__).exception("Error en un listener de cambios de usuario")
 
 def update_user(dni, new_password=None, new_role=None):
-    """Actualiza la contraseña o el rol de un usuario."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    """
+    Actualiza la contraseña o el rol de un usuario.
+    Cambiar la contraseña cierra todas las sesiones abiertas del usuario.
+    """
     updates = []
     params = []
 
@@ -120,35 +640,285 @@ def update_user(dni, new_password=None, new_role=None):
         params.append(new_role)
 
     if not updates:
-        conn.close()
         return False # No hay nada que actualizar
 
     query = f"UPDATE users SET {', '.join(updates)} WHERE dni = ?"
     params.append(dni)
 
-    try:
-        cursor.execute(query, tuple(params))
-        conn.commit()
-        return cursor.rowcount > 0 # Retorna True si se actualizó al menos una fila
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        cursor = conn.execute(query, tuple(params))
+        if new_password and cursor.rowcount > 0:
+            conn.execute("DELETE FROM sessions WHERE user_dni = ?", (dni,))
+    if cursor.rowcount > 0:
+        _notify_user_change(dni)
+    return cursor.rowcount > 0 # Retorna True si se actualizó al menos una fila
 
 def delete_user(dni):
-    """Elimina un usuario de la base de datos."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("PRAGMA foreign_keys = ON;") # Asegura que las claves foráneas estén activas
-        cursor.execute("DELETE FROM users WHERE dni = ?", (dni,))
-        conn.commit()
-        return cursor.rowcount > 0 # Retorna True si se eliminó al menos una fila
-    finally:
-        conn.close()
+    """
+    Elimina un usuario de la base de datos (y sus jornadas y sesiones, por ON DELETE CASCADE)
+    y sus jornadas de los años archivados.
+    """
+    with get_connection() as conn:
+        cursor = conn.execute("DELETE FROM users WHERE dni = ?", (dni,))
+    if cursor.rowcount > 0:
+        _notify_user_change(dni)
+    if DATABASE_SHARDS and cursor.rowcount > 0:
+        # Entre ficheros distintos no hay ON DELETE CASCADE: borrar sus datos en su partición
+        with write_transaction(get_connection(workday_database(dni))) as shard:
+            for table in ('workdays', 'workday_summaries', 'workday_versions'):
+                shard.execute(f"DELETE FROM {table} WHERE user_dni = ?", (dni,))
+    if cursor.rowcount > 0:
+        _delete_archived_user(workday_database(dni), dni)
+    return cursor.rowcount > 0 # Retorna True si se eliminó al menos una fila
+
+def _delete_archived_user(path, dni):
+    """Borra las jornadas de un usuario de los archivos por año del fichero de jornadas `path`."""
+    for year in archive_years(path):
+        archive = _open_archive(archive_path(path, year))
+        try:
+            with archive:
+                archive.execute("DELETE FROM workdays WHERE user_dni = ?", (dni,))
+        finally:
+            archive.close()
+
+# --- Sesiones ---
+def create_session(dni, token_hash, expires_at):
+    """Registra una sesión que caduca en `expires_at` (ms) y borra las ya caducadas."""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (int(time.time() * 1000),))
+        conn.execute("INSERT INTO sessions (token_hash, user_dni, expires_at) VALUES (?, ?, ?)",
+                     (token_hash, dni, expires_at))
+
+def get_session(token_hash):
+    """Devuelve (DNI, rol, caducidad en ms) de una sesión vigente, o None."""
+    row = get_connection().execute('''
+        SELECT sessions.user_dni, users.role, sessions.expires_at
+        FROM sessions JOIN users ON users.dni = sessions.user_dni
+        WHERE sessions.token_hash = ? AND sessions.expires_at > ?
+    ''', (token_hash, int(time.time() * 1000))).fetchone()
+    return tuple(row) if row else None
+
+def delete_session(token_hash):
+    """Cierra una sesión. Devuelve True si existía."""
+    with get_connection() as conn:
+        cursor = conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+    return cursor.rowcount > 0
+
+# --- Agregados de tiempo trabajado ---
+SUMMARY_GRANULARITIES = ('week', 'month', 'year')
+
+def effective_work_ms(start_time, end_time, total_break_duration):
+    """Tiempo de trabajo efectivo de una jornada (fin - inicio - pausas), 0 si no ha terminado."""
+    if not start_time or not end_time:
+        return 0
+    return max(0, end_time - start_time - (total_break_duration or 0))
+
+def period_keys(date):
+    """
+    Devuelve {granularidad: periodo} para una fecha YYYY-MM-DD.
+    Semanas ISO ('2024-W07'), meses ('2024-02') y años ('2024'); todas se ordenan como texto.
+    """
+    day = datetime.date.fromisoformat(date)
+    iso_year, iso_week, _ = day.isocalendar()
+    return {
+        'week': f"{iso_year}-W{iso_week:02d}",
+        'month': date[:7],
+        'year': date[:4],
+    }
+
+def _apply_summary_delta(conn, user_dni, date, start_time, end_time, total_break_duration, sign):
+    """Suma (sign=1) o resta (sign=-1) la contribución de una jornada a sus agregados."""
+    work_ms = effective_work_ms(start_time, end_time, total_break_duration) * sign
+    break_ms = (total_break_duration or 0) * sign
+    conn.executemany('''
+        INSERT INTO workday_summaries (granularity, period, user_dni, days, work_ms, break_ms)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (granularity, period, user_dni) DO UPDATE SET
+            days = days + excluded.days,
+            work_ms = work_ms + excluded.work_ms,
+            break_ms = break_ms + excluded.break_ms
+    ''', [(granularity, period, user_dni, sign, work_ms, break_ms)
+          for granularity, period in period_keys(date).items()])
+    if sign < 0:
+        conn.execute("DELETE FROM workday_summaries WHERE user_dni = ? AND days <= 0", (user_dni,))
+
+# Las mismas claves que period_keys() calculadas en SQL. La semana ISO es la del jueves de
+# esa semana: date(d, '-3 days', 'weekday 4') lleva cualquier día de lunes a domingo a su jueves.
+PERIOD_SQL = {
+    'week': "strftime('%Y', date(date, '-3 days', 'weekday 4')) || '-W' || "
+            "printf('%02d', (strftime('%j', date(date, '-3 days', 'weekday 4')) - 1) / 7 + 1)",
+    'month': "substr(date, 1, 7)",
+    'year': "substr(date, 1, 4)",
+}
+
+def _summary_select(granularity, where=''):
+    """SELECT de los totales por (granularidad, periodo, usuario) de una tabla workdays."""
+    return f'''
+        SELECT ?, {PERIOD_SQL[granularity]} AS period, user_dni, COUNT(*),
+               SUM(CASE WHEN start_time AND end_time
+                        THEN MAX(0, end_time - start_time - COALESCE(total_break_duration, 0))
+                        ELSE 0 END),
+               SUM(COALESCE(total_break_duration, 0))
+        FROM workdays {where}
+        GROUP BY period, user_dni
+    '''
+
+def rebuild_summaries(conn):
+    """
+    Recalcula desde cero la tabla workday_summaries a partir de workdays y de los años
+    archivados del mismo fichero (sin commit).
+    """
+    conn.execute("DELETE FROM workday_summaries")
+    path = _connection_path(conn)
+    years = archive_years(path)
+    # En el fichero de usuarios (con claves foráneas) se descartan los usuarios eliminados
+    # cuyas jornadas archivadas sigan en los archivos, que no borra ON DELETE CASCADE
+    known_users = None
+    if years and conn.execute("PRAGMA foreign_keys").fetchone()[0]:
+        known_users = {row[0] for row in conn.execute("SELECT dni FROM users")}
+    hot_where, hot_params = ("WHERE date >= ?", [_hot_from(years)]) if years else ('', [])
+    for granularity in SUMMARY_GRANULARITIES:
+        conn.execute(f'''
+            INSERT INTO workday_summaries (granularity, period, user_dni, days, work_ms, break_ms)
+            {_summary_select(granularity, hot_where)}
+        ''', [granularity] + hot_params)
+    for year in years:
+        # Los archivos se leen con una conexión aparte: no se pueden adjuntar dentro de una transacción
+        archive = sqlite3.connect(_sqlite_uri(archive_path(path, year), read_only=True), uri=True)
+        try:
+            for granularity in SUMMARY_GRANULARITIES:
+                rows = archive.execute(_summary_select(granularity), (granularity,)).fetchall()
+                if known_users is not None:
+                    rows = [row for row in rows if row[2] in known_users]
+                # Una semana ISO puede repartirse entre dos años: sumar a lo ya calculado
+                conn.executemany('''
+                    INSERT INTO workday_summaries (granularity, period, user_dni, days, work_ms, break_ms)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (granularity, period, user_dni) DO UPDATE SET
+                        days = days + excluded.days,
+                        work_ms = work_ms + excluded.work_ms,
+                        break_ms = break_ms + excluded.break_ms
+                ''', rows)
+        finally:
+            archive.close()
+
+def get_workday_summary(granularity, user_dni=None, period_from=None, period_to=None, by_user=True):
+    """
+    Obtiene los totales de trabajo por periodo desde la tabla de agregados.
+    Sin user_dni devuelve todos los usuarios; con by_user=False suma todos los usuarios por periodo.
+    Cada fila incluye días registrados, trabajo y pausas totales (ms) y la media de trabajo por día.
+    """
+    conditions = ["granularity = ?"]
+    params = [granularity]
+    if user_dni:
+        conditions.append("user_dni = ?")
+        params.append(user_dni)
+    if period_from:
+        conditions.append("period >= ?")
+        params.append(period_from)
+    if period_to:
+        conditions.append("period <= ?")
+        params.append(period_to)
+    where = " AND ".join(conditions)
+
+    if by_user:
+        query = f'''
+            SELECT user_dni, period, days, work_ms, break_ms
+            FROM workday_summaries WHERE {where} ORDER BY period, user_dni
+        '''
+    else:
+        query = f'''
+            SELECT NULL, period, SUM(days), SUM(work_ms), SUM(break_ms)
+            FROM workday_summaries WHERE {where} GROUP BY period ORDER BY period
+        '''
+
+    if user_dni:
+        rows = get_connection(workday_database(user_dni)).execute(query, tuple(params)).fetchall()
+    else:
+        results = _fan_out(lambda path: get_connection(path).execute(query, tuple(params)).fetchall())
+        rows = list(heapq.merge(*results, key=lambda row: (row[1], row[0] or '')))
+        if not by_user and len(results) > 1:
+            # Cada partición suma sus usuarios: sumar también los totales de un mismo periodo
+            rows = [(None, period, *(sum(values) for values in list(zip(*group))[2:]))
+                    for period, group in itertools.groupby(rows, key=lambda row: row[1])]
+
+    summary = []
+    for row in rows:
+        entry = {
+            'period': row[1],
+            'days': row[2],
+            'work_ms': row[3],
+            'break_ms': row[4],
+            'avg_work_ms': row[3] // row[2] if row[2] else 0,
+        }
+        if by_user:
+            entry['user_dni'] = row[0]
+        summary.append(entry)
+    return summary
+
+# --- Versiones de datos por usuario (ETag / Last-Modified) ---
+def bump_data_versions(conn, user_dnis):
+    """Incrementa la versión de datos de los usuarios indicados (sin commit)."""
+    now_ms = int(time.time() * 1000)
+    conn.executemany('''
+        INSERT INTO workday_versions (user_dni, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_dni) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+    ''', [(user_dni, now_ms) for user_dni in user_dnis])
+
+def get_data_version(user_dni):
+    """
+    Devuelve (versión, updated_at en ms) de los datos de un usuario.
+    Un usuario sin escrituras registradas tiene versión 0 y updated_at None.
+    """
+    conn = get_connection(workday_database(user_dni))
+    row = conn.execute("SELECT version, updated_at FROM workday_versions WHERE user_dni = ?", (user_dni,)).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+def get_data_versions_since(updated_after_ms):
+    """Devuelve [(user_dni, versión, updated_at)] de los usuarios cuyos datos cambiaron después de updated_after_ms."""
+    results = _fan_out(lambda path: get_connection(path).execute(
+        "SELECT user_dni, version, updated_at FROM workday_versions WHERE updated_at > ?", (updated_after_ms,)).fetchall())
+    return [row for rows in results for row in rows]
+
+# --- Avisos de cambios en jornadas ---
+# Funciones listener(user_dni, date) a las que se avisa tras confirmar cada escritura de una
+# jornada en este proceso (p. ej. el panel de presencia). Un error en un listener no afecta a la escritura.
+_workday_listeners = []
+
+def add_workday_listener(listener):
+    _workday_listeners.append(listener)
+
+def _notify_workday_change(user_dni, date):
+    for listener in _workday_listeners:
+        try:
+            listener(user_dni, date)
+        except Exception:
+            logging.getLogger(__name__).exception("Error en un listener de cambios de jornada")
+
+def encode_events(events):
+    """Convierte la lista de eventos de una jornada al formato en que se guarda en la columna events."""
+    return event_codec.encode(events)
+
+def decode_events(value):
+    """
+    Convierte el valor de la columna events en la lista de eventos: formato compacto, texto
+    JSON (filas que no encajan en el formato compacto) o JSON comprimido (archivos).
+    """
+    if not value:
+        return []
+    if event_codec.is_compact(value):
+        return event_codec.decode(value)
+    if isinstance(value, bytes):
+        value = zlib.decompress(value)
+    return json.loads(value)
 
 def save_workday(user_dni, workday_data):
     """Guarda o actualiza los datos de la jornada laboral."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    _check_writable(user_dni, workday_data.get('date'))
+    run_write(_save_workday, user_dni, workday_data)
+    _notify_workday_change(user_dni, workday_data.get('date'))
+
+def _save_workday(conn, user_dni, workday_data):
     # Asegúrate de que los datos estén en el formato correcto para la base de datos
     # Las claves del diccionario deben coincidir con las columnas de la tabla
     date = workday_data.get('date')
@@ -156,86 +926,597 @@ def save_workday(user_dni, workday_data):
     end_time = workday_data.get('end_time')
     total_break_duration = workday_data.get('total_break_duration', 0)
     events = workday_data.get('events')
+    _check_writable_locked(conn, date)
 
-    # Convertir la lista de eventos a JSON string para almacenarla
-    import json
-    events_json = json.dumps(events)
+    events_json = encode_events(events)
 
-    cursor.execute('''
+    # Retirar la contribución de la versión anterior de la jornada a los agregados
+    previous = conn.execute("SELECT start_time, end_time, total_break_duration FROM workdays WHERE user_dni = ? AND date = ?",
+                            (user_dni, date)).fetchone()
+    if previous:
+        _apply_summary_delta(conn, user_dni, date, *previous, sign=-1)
+    conn.execute('''
         INSERT OR REPLACE INTO workdays (user_dni, date, start_time, end_time, total_break_duration, events)
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (user_dni, date, start_time, end_time, total_break_duration, events_json))
-    conn.commit()
-    conn.close()
+    _apply_summary_delta(conn, user_dni, date, start_time, end_time, total_break_duration, sign=1)
+    bump_data_versions(conn, [user_dni])
+
+# Tipos de evento que envía app.js y que modifican los totales de la jornada
+EVENT_WORKDAY_STARTED = 'Jornada Iniciada'
+EVENT_WORKDAY_FINISHED = 'Jornada Finalizada'
+EVENT_BREAK_FINISHED = 'Pausa Finalizada'
+
+def append_workday_event(user_dni, date, event, time, duration=None):
+    """
+    Añade un evento al final de la jornada sin reescribirla entera, creando la jornada si no existe.
+    Actualiza en la misma sentencia start_time ('Jornada Iniciada'), end_time ('Jornada Finalizada')
+    y total_break_duration ('Pausa Finalizada' suma su duración). Como el evento se añade
+    dentro de la transacción de escritura, dos pestañas que fichan a la vez no se pisan los eventos.
+    Devuelve los totales resultantes de la jornada.
+    """
+    _check_writable(user_dni, date)
+    result = run_write(_append_workday_event, user_dni, date, event, time, duration)
+    _notify_workday_change(user_dni, date)
+    return result
+
+def _append_workday_event(conn, user_dni, date, event, time, duration):
+    _check_writable_locked(conn, date)
+    start_time = time if event == EVENT_WORKDAY_STARTED else None
+    end_time = time if event == EVENT_WORKDAY_FINISHED else None
+    break_ms = (duration or 0) if event == EVENT_BREAK_FINISHED else 0
+
+    previous = conn.execute("SELECT start_time, end_time, total_break_duration, events FROM workdays WHERE user_dni = ? AND date = ?",
+                            (user_dni, date)).fetchone()
+    if previous:
+        _apply_summary_delta(conn, user_dni, date, *previous[:3], sign=-1)
+    # En formato compacto el evento se concatena sin decodificar los anteriores
+    events = event_codec.append(previous[3] if previous else None,
+                                {'event': event, 'time': time, 'duration': duration})
+    row = conn.execute('''
+        INSERT INTO workdays (user_dni, date, start_time, end_time, total_break_duration, events)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_dni, date) DO UPDATE SET
+            start_time = COALESCE(start_time, excluded.start_time),
+            end_time = COALESCE(excluded.end_time, end_time),
+            total_break_duration = COALESCE(total_break_duration, 0) + excluded.total_break_duration,
+            events = excluded.events
+        RETURNING start_time, end_time, total_break_duration
+    ''', (user_dni, date, start_time, end_time, break_ms, events)).fetchall()[0]
+    _apply_summary_delta(conn, user_dni, date, row[0], row[1], row[2], sign=1)
+    bump_data_versions(conn, [user_dni])
+
+    return {
+        'user_dni': user_dni,
+        'date': date,
+        'start_time': row[0],
+        'end_time': row[1],
+        'total_break_duration': row[2],
+        'event_count': event_codec.count(events),
+    }
+
+# Columnas de las filas de workdays que devuelven las lecturas (events solo si se piden)
+WORKDAY_COLUMNS = ('user_dni', 'date', 'start_time', 'end_time', 'total_break_duration', 'events')
+
+def _row_to_workday(row):
+    """
+    Convierte una fila de la tabla workdays en el diccionario que devuelve la API.
+    Si la consulta no seleccionó la columna events, el diccionario no incluye la clave.
+    """
+    workday = {
+        'user_dni': row[0],
+        'date': row[1],
+        'start_time': row[2],
+        'end_time': row[3],
+        'total_break_duration': row[4],
+    }
+    if len(row) > 5:
+        # Convertir los eventos guardados de vuelta a una lista
+        workday['events'] = decode_events(row[5])
+    return workday
 
 def get_workday(user_dni, date):
     """Obtiene los datos de la jornada laboral para un usuario y fecha específicos."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_dni, date, start_time, end_time, total_break_duration, events FROM workdays WHERE user_dni = ? AND date = ?", (user_dni, date))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        # Convertir la cadena JSON de eventos de vuelta a una lista
-        import json
-        events = json.loads(row[5]) if row[5] else []
-        return {
-            'user_dni': row[0],
-            'date': row[1],
-            'start_time': row[2],
-            'end_time': row[3],
-            'total_break_duration': row[4],
-            'events': events
-        }
+    results = _select_workdays(workday_database(user_dni),
+                               "user_dni, date, start_time, end_time, total_break_duration, events",
+                               ["user_dni = ?", "date = ?"], [user_dni, date], "date", date, date)
+    rows = [row for rows in results for row in rows]
+    if rows:
+        return _row_to_workday(rows[0])
     return None
 
-def get_all_workdays_for_user(user_dni):
-    """Obtiene todas las jornadas laborales para un usuario específico."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_dni, date, start_time, end_time, total_break_duration, events FROM workdays WHERE user_dni = ?", (user_dni,))
-    rows = cursor.fetchall()
-    conn.close()
-    workdays = []
-    import json
-    for row in rows:
-        events = json.loads(row[5]) if row[5] else []
-        workdays.append({
-            'user_dni': row[0],
-            'date': row[1],
-            'start_time': row[2],
-            'end_time': row[3],
-            'total_break_duration': row[4],
-            'events': events
-        })
-    return workdays
-
-def get_all_workdays_all_users():
-    """Obtiene todas las jornadas laborales de todos los usuarios."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_dni, date, start_time, end_time, total_break_duration, events FROM workdays ORDER BY user_dni, date DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    workdays = []
-    import json
-    for row in rows:
-        events = json.loads(row[5]) if row[5] else []
-        workdays.append({
-            'user_dni': row[0],
-            'date': row[1],
-            'start_time': row[2],
-            'end_time': row[3],
-            'total_break_duration': row[4],
-            'events': events
-        })
-    return workdays
+def get_all_workdays_for_user(user_dni, date_from=None, date_to=None, include_events=True, raw=False):
+    """
+    Obtiene las jornadas laborales de un usuario ordenadas por fecha.
+    date_from/date_to (YYYY-MM-DD, inclusivas) limitan el rango; con include_events=False
+    no se leen ni se decodifican los eventos. Con raw=True devuelve las filas tal como se
+    leen (tuplas en el orden de WORKDAY_COLUMNS, eventos sin decodificar) en lugar de diccionarios.
+    La consulta recorre la clave primaria (user_dni, date), que ya entrega las filas ordenadas;
+    los años archivados que alcanza el rango van delante, en orden.
+    """
+    columns = "user_dni, date, start_time, end_time, total_break_duration"
+    if include_events:
+        columns += ", events"
+    conditions = ["user_dni = ?"]
+    params = [user_dni]
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+
+    results = _select_workdays(workday_database(user_dni), columns, conditions, params, "date", date_from, date_to)
+    if raw:
+        return [row for rows in results for row in rows]
+    return [_row_to_workday(row) for rows in results for row in rows]
+
+def get_all_workdays_all_users(include_events=True):
+    """
+    Obtiene todas las jornadas laborales de todos los usuarios.
+    Con include_events=False no se leen ni se decodifican los eventos.
+    """
+    columns = "user_dni, date, start_time, end_time, total_break_duration"
+    if include_events:
+        columns += ", events"
+
+    def read(path):
+        results = _select_workdays(path, columns, [], [], "user_dni, date DESC")
+        # Fecha descendente: para un mismo usuario, los orígenes más recientes primero
+        return list(_merge_by_user(reversed(results)))
+    return [_row_to_workday(row) for row in _merge_by_user(_fan_out(read))]
+
+def get_workdays_page(user_dni=None, date_from=None, date_to=None, limit=100, after=None, include_events=True,
+                      raw=False):
+    """
+    Obtiene una página de jornadas de todos los usuarios, ordenadas por DNI y fecha descendente.
+    Los filtros son opcionales; las fechas son inclusivas (YYYY-MM-DD). Con include_events=False
+    no se leen ni se decodifican los eventos; raw=True, como en get_all_workdays_for_user().
+    `after` es la clave (user_dni, date) de la última jornada de la página anterior (paginación por clave).
+    Devuelve (jornadas, clave_siguiente), donde clave_siguiente es None si no hay más páginas.
+    """
+    conditions = []
+    params = []
+    if user_dni:
+        conditions.append("user_dni = ?")
+        params.append(user_dni)
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+    if after:
+        # Equivale a (user_dni, date) "después de" la clave en el orden (user_dni ASC, date DESC);
+        # el primer término permite a SQLite empezar el recorrido del índice en la clave.
+        conditions.append("user_dni >= ? AND (user_dni > ? OR date < ?)")
+        params.extend([after[0], after[0], after[1]])
+    columns = "user_dni, date, start_time, end_time, total_break_duration"
+    if include_events:
+        columns += ", events"
+
+    def read(path):
+        # Cada origen devuelve su primera página (una fila extra indica si hay página siguiente);
+        # la mezcla se queda con las limit + 1 primeras
+        results = _select_workdays(path, columns, conditions, params, "user_dni, date DESC", date_from, date_to, limit + 1)
+        return list(itertools.islice(_merge_by_user(reversed(results)), limit + 1))
+
+    if user_dni:
+        rows = read(workday_database(user_dni))
+    else:
+        rows = list(itertools.islice(_merge_by_user(_fan_out(read)), limit + 1))
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = (rows[-1][0], rows[-1][1])
+    if raw:
+        return rows, next_key
+    return [_row_to_workday(row) for row in rows], next_key
+
+def get_open_workdays(date_from, user_dni=None):
+    """
+    Jornadas abiertas (iniciadas y sin finalizar) desde date_from, con sus eventos.
+    Usa idx_workdays_date, o idx_workdays_user_date_desc si se indica el usuario.
+    """
+    conditions = ["date >= ?", "start_time IS NOT NULL", "end_time IS NULL"]
+    params = [date_from]
+    if user_dni:
+        conditions.append("user_dni = ?")
+        params.append(user_dni)
+
+    def read(path):
+        # '+user_dni': sin estadísticas (ANALYZE) SQLite recorrería toda la clave primaria para
+        # no ordenar; así busca el rango de fechas en el índice y ordena las pocas jornadas abiertas
+        results = _select_workdays(path, "user_dni, date, start_time, end_time, total_break_duration, events",
+                                   conditions, params, "+user_dni, date", date_from)
+        return list(_merge_by_user(results))
+
+    rows = read(workday_database(user_dni)) if user_dni else _merge_by_user(_fan_out(read))
+    return [_row_to_workday(row) for row in rows]
+
+EXPORT_BATCH_SIZE = 500
+
+def iter_workdays(user_dni=None, date_from=None, date_to=None, include_events=True, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Recorre las jornadas en lotes de `batch_size` filas (fetchmany) sin cargar la tabla en memoria.
+    Ordena por fecha si se filtra por usuario y por (user_dni, date) en caso contrario.
+    Cada origen (partición o año archivado) se lee con una conexión propia que se cierra al
+    agotar o abandonar el generador, para no dejar una lectura abierta en la conexión
+    persistente del hilo.
+    """
+    columns = "user_dni, date, start_time, end_time, total_break_duration"
+    if include_events:
+        columns += ", events"
+    conditions = []
+    params = []
+    if user_dni:
+        conditions.append("user_dni = ?")
+        params.append(user_dni)
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+
+    paths = [workday_database(user_dni)] if user_dni else shard_paths()
+    sources = [_iter_workdays_source(path, year, query, query_params, batch_size)
+               for path in paths
+               for year, query, query_params in _source_queries(path, columns, conditions, params,
+                                                                "user_dni, date", date_from, date_to)]
+    if len(sources) == 1:
+        yield from sources[0]
+    else:
+        # Mezcla perezosa de todos los orígenes, sin cargarlos en memoria
+        yield from _merge_by_user(sources, key=lambda workday: workday['user_dni'])
+
+def _iter_workdays_source(path, year, query, params, batch_size):
+    conn = connect(path)
+    try:
+        if year:
+            _attach_archive(conn, path, year)
+        cursor = conn.execute(query, tuple(params))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _row_to_workday(row)
+    finally:
+        conn.close()
 
 def delete_workday(user_dni, date):
     """Elimina una jornada laboral para un usuario y fecha específicos."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM workdays WHERE user_dni = ? AND date = ?", (user_dni, date))
+    _check_writable(user_dni, date)
+    run_write(_delete_workday, user_dni, date)
+    _notify_workday_change(user_dni, date)
+
+def _delete_workday(conn, user_dni, date):
+    _check_writable_locked(conn, date)
+    previous = conn.execute("SELECT start_time, end_time, total_break_duration FROM workdays WHERE user_dni = ? AND date = ?",
+                            (user_dni, date)).fetchone()
+    if previous:
+        conn.execute("DELETE FROM workdays WHERE user_dni = ? AND date = ?", (user_dni, date))
+        _apply_summary_delta(conn, user_dni, date, *previous, sign=-1)
+        bump_data_versions(conn, [user_dni])
+
+# --- Archivado de años cerrados ---
+ARCHIVE_BATCH_SIZE = 5000
+# Vueltas de copia desde instantáneas de lectura antes de tomar el bloqueo de escritura: se
+# repiten mientras cambien más de ARCHIVE_LOCKED_MAX_USERS usuarios entre una y otra
+ARCHIVE_CATCH_UP_ROUNDS = 5
+ARCHIVE_LOCKED_MAX_USERS = 20
+_ARCHIVE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS workdays (
+        user_dni TEXT NOT NULL,
+        date TEXT NOT NULL,
+        start_time INTEGER,
+        end_time INTEGER,
+        total_break_duration INTEGER DEFAULT 0,
+        events BLOB,
+        PRIMARY KEY (user_dni, date)
+    )
+'''
+
+def _open_archive(path):
+    """Abre (y crea si no existe) un fichero de archivo para escribir en él."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Sin WAL: los archivos se adjuntan en solo lectura y no deben dejar ficheros -wal/-shm
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute(_ARCHIVE_SCHEMA)
     conn.commit()
-    conn.close()
+    return conn
+
+def archive_workdays(before_year, vacuum=False):
+    """
+    Mueve las jornadas de los años anteriores a `before_year` de cada fichero de jornadas a
+    sus archivos por año y devuelve {año: jornadas archivadas}. Si un año ya estaba
+    archivado, sus jornadas se añaden al archivo existente.
+    Cada año se copia desde una instantánea de lectura y solo se toma el bloqueo de escritura
+    para recopiar lo que cambió entretanto y sustituir el archivo (el año se borra después
+    de la tabla principal en lotes cortos), así que ninguna escritura se pierde y los
+    fichajes no esperan a la copia. Con vacuum=True compacta después los ficheros de
+    jornadas (VACUUM bloquea la base de datos mientras dura).
+    Solo se archivan años ya terminados: `before_year` no puede ser posterior al actual.
+    """
+    if int(before_year) > datetime.date.today().year:
+        raise ValueError(f"No se puede archivar el año en curso: before_year debe ser como mucho {datetime.date.today().year}")
+    cutoff = f"{int(before_year):04d}-01-01"
+    paths = shard_paths()
+    years = set()
+    for path in paths:
+        years.update(int(row[0]) for row in get_connection(path).execute(
+            "SELECT DISTINCT substr(date, 1, 4) FROM workdays WHERE date < ?", (cutoff,)))
+    archived = {}
+    for path in paths:
+        conn = connect(path)
+        try:
+            # Todos los ficheros cierran los mismos años, aunque alguno no tenga jornadas en ellos
+            for year in sorted(years):
+                archived[year] = archived.get(year, 0) + _archive_year(conn, path, year)
+            conn.execute("ANALYZE")
+            if vacuum:
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+    return archived
+
+def _archive_year(conn, path, year):
+    """
+    Archiva un año en dos fases para no bloquear los fichajes mientras dura:
+      1. Desde una instantánea de lectura (WAL no bloquea a los escritores) copia y comprime
+         el año en un archivo temporal y lo compacta con VACUUM, anotando la versión de
+         datos de cada usuario en esa instantánea. Después, también sin bloqueo, vuelve a
+         copiar los usuarios cuya versión ha cambiado mientras sean muchos.
+      2. Con el bloqueo de escritura tomado vuelve a copiar solo los usuarios cuya versión
+         cambió desde la última instantánea (toda escritura de jornadas la incrementa en su
+         misma transacción) y sustituye el archivo.
+    Por último borra el año de la tabla principal en lotes cortos (_delete_archived_rows).
+    """
+    final_path = archive_path(path, year)
+    temp_path = final_path + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path) # Restos de un archivado interrumpido
+    first, last = f"{year}-01-01", f"{year}-12-31"
+    archive = _open_archive(temp_path)
+    try:
+        if os.path.exists(final_path):
+            archive.execute("ATTACH DATABASE ? AS previous", (_sqlite_uri(final_path, read_only=True),))
+            archive.execute("INSERT INTO workdays SELECT * FROM previous.workdays")
+            archive.commit()
+            archive.execute("DETACH DATABASE previous")
+
+        conn.execute("BEGIN") # Instantánea de lectura: versiones y filas del mismo momento
+        try:
+            versions = dict(conn.execute("SELECT user_dni, version FROM workday_versions"))
+            _copy_archive_rows(conn, archive, "date BETWEEN ? AND ?", (first, last))
+        finally:
+            conn.rollback()
+        archive.commit()
+        # Compactar: las filas quedan contiguas y sin páginas libres
+        archive.execute("VACUUM")
+
+        # Ponerse al día sin bloqueo mientras cambien muchos usuarios entre una vuelta y otra
+        for _ in range(ARCHIVE_CATCH_UP_ROUNDS):
+            conn.execute("BEGIN")
+            try:
+                current = dict(conn.execute("SELECT user_dni, version FROM workday_versions"))
+                changed = _changed_users(versions, current)
+                if len(changed) <= ARCHIVE_LOCKED_MAX_USERS:
+                    break
+                _recopy_archive_users(conn, archive, changed, first, last)
+            finally:
+                conn.rollback()
+            archive.commit()
+            versions = current
+
+        with write_transaction(conn):
+            current = dict(conn.execute("SELECT user_dni, version FROM workday_versions"))
+            _recopy_archive_users(conn, archive, _changed_users(versions, current), first, last)
+            archive.commit()
+            count = archive.execute("SELECT COUNT(*) FROM workdays WHERE date BETWEEN ? AND ?", (first, last)).fetchone()[0]
+            archive.close()
+            archive = None
+            # A partir de aquí las lecturas toman el año del archivo y las escrituras lo rechazan
+            os.replace(temp_path, final_path)
+    finally:
+        if archive is not None:
+            archive.close()
+    _delete_archived_rows(conn, first, last)
+    return count
+
+def _delete_archived_rows(conn, first, last):
+    """
+    Borra de la tabla principal las jornadas ya archivadas entre first y last, en lotes de
+    ARCHIVE_BATCH_SIZE con una transacción corta cada uno. Las lecturas ya las ignoran (solo
+    miran la tabla principal desde _hot_from), así que si se interrumpe no hay nada que
+    deshacer: volver a archivar el año las copia de nuevo (son iguales) y termina el borrado.
+    """
+    while True:
+        with write_transaction(conn):
+            deleted = conn.execute('''
+                DELETE FROM workdays WHERE rowid IN (
+                    SELECT rowid FROM workdays WHERE date BETWEEN ? AND ? LIMIT ?)
+            ''', (first, last, ARCHIVE_BATCH_SIZE)).rowcount
+        if deleted < ARCHIVE_BATCH_SIZE:
+            return
+
+def _changed_users(before, after):
+    """Usuarios cuya versión de datos es distinta entre dos lecturas de workday_versions."""
+    return [dni for dni in before.keys() | after.keys() if before.get(dni) != after.get(dni)]
+
+def _recopy_archive_users(conn, archive, user_dnis, first, last):
+    """Sustituye en `archive` las jornadas entre first y last de los usuarios indicados."""
+    for dni in user_dnis:
+        archive.execute("DELETE FROM workdays WHERE user_dni = ? AND date BETWEEN ? AND ?", (dni, first, last))
+        _copy_archive_rows(conn, archive, "user_dni = ? AND date BETWEEN ? AND ?", (dni, first, last))
+
+def _copy_archive_rows(conn, archive, where, params):
+    """Copia a `archive` (comprimiendo los eventos) las jornadas de la tabla principal que cumplen `where`."""
+    cursor = conn.execute(f'''
+        SELECT user_dni, date, start_time, end_time, total_break_duration, events
+        FROM workdays WHERE {where} ORDER BY user_dni, date
+    ''', params)
+    while True:
+        rows = cursor.fetchmany(ARCHIVE_BATCH_SIZE)
+        if not rows:
+            break
+        archive.executemany("INSERT OR REPLACE INTO workdays VALUES (?, ?, ?, ?, ?, ?)",
+                            [row[:5] + (compress_events(row[5]),) for row in rows])
+
+
+# --- Reparto de las jornadas entre particiones ---
+RESHARD_BATCH_SIZE = 5000
+# Tablas que se mueven fila a fila; workday_summaries se recalcula al final en cada fichero
+_RESHARD_TABLES = {
+    'workdays': "user_dni, date, start_time, end_time, total_break_duration, events",
+    'workday_versions': "user_dni, version, updated_at",
+}
+
+def reshard(target_shards, batch_size=RESHARD_BATCH_SIZE):
+    """
+    Mueve las jornadas desde la distribución actual (DATABASE_SHARDS) a `target_shards`
+    particiones (0 para volver a un único fichero) y devuelve el número de filas movidas.
+    Debe ejecutarse con la aplicación parada; después se arranca con WORKDAY_DB_SHARDS=target_shards.
+    Cada lote se escribe en su destino y después se borra del origen, así que si se
+    interrumpe basta con volver a ejecutarlo.
+    """
+    source_paths = shard_paths()
+    target_paths = shard_paths(target_shards)
+    for path in [DATABASE_NAME] + target_paths:
+        migrate(path)
+
+    moved = 0
+    targets = {path: connect(path) for path in target_paths}
+    try:
+        for source_path in source_paths:
+            source = targets.get(source_path) or connect(source_path)
+            try:
+                for table, columns in _RESHARD_TABLES.items():
+                    moved += _move_rows(source, source_path, table, columns, targets, target_paths, batch_size)
+            finally:
+                if source_path not in targets:
+                    source.close()
+        archive_sources = {path: archive_years(path) for path in source_paths}
+        for year in sorted(set().union(*archive_sources.values())):
+            moved += _move_archive_year(year, [path for path, years in archive_sources.items() if year in years],
+                                        target_paths, batch_size)
+        # Recalcular los agregados de todos los ficheros que han perdido o recibido jornadas
+        for path in dict.fromkeys(source_paths + target_paths):
+            conn = targets.get(path) or connect(path)
+            try:
+                with write_transaction(conn):
+                    rebuild_summaries(conn)
+            finally:
+                if path not in targets:
+                    conn.close()
+    finally:
+        for conn in targets.values():
+            conn.close()
+    return moved
+
+def _move_archive_year(year, source_paths, target_paths, batch_size):
+    """Reparte las jornadas archivadas de `year`; todos los ficheros de destino tienen su archivo del año."""
+    moved = 0
+    targets = {archive_path(path, year): _open_archive(archive_path(path, year)) for path in target_paths}
+    try:
+        for source_path in [archive_path(path, year) for path in source_paths]:
+            source = targets.get(source_path) or _open_archive(source_path)
+            try:
+                moved += _move_rows(source, source_path, 'workdays', _RESHARD_TABLES['workdays'],
+                                    targets, list(targets), batch_size)
+            finally:
+                if source_path not in targets:
+                    source.close()
+                    os.remove(source_path) # Ya vacío: el fichero de jornadas de origen no se usará más
+    finally:
+        for conn in targets.values():
+            conn.close()
+    return moved
+
+def _move_rows(source, source_path, table, columns, targets, target_paths, batch_size):
+    moved = 0
+    last_rowid = 0
+    while True:
+        rows = source.execute(f"SELECT rowid, {columns} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                              (last_rowid, batch_size)).fetchall()
+        if not rows:
+            return moved
+        last_rowid = rows[-1][0]
+        by_target = {}
+        for row in rows:
+            target_path = target_paths[shard_index(row[1], len(target_paths))]
+            if target_path != source_path:
+                by_target.setdefault(target_path, []).append(row)
+        placeholders = ', '.join('?' * len(columns.split(',')))
+        for target_path, target_rows in by_target.items():
+            with write_transaction(targets[target_path]) as target:
+                target.executemany(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})",
+                                   [row[1:] for row in target_rows])
+            with write_transaction(source):
+                source.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(row[0],) for row in target_rows])
+            moved += len(target_rows)
+
+
+# --- Línea de comandos ---
+# Usuarios de ejemplo que antes se creaban en cada arranque
+SEED_USERS = [
+    ('12345678A', 'pass', 'user'),
+    ('admin', 'adminpass', 'admin'),
+]
+
+def seed_users():
+    """Crea los usuarios de ejemplo que no existan y devuelve los DNI creados."""
+    return [dni for dni, password, role in SEED_USERS if add_user(dni, password, role)]
+
+def main(argv=None):
+    """
+    Uso (desde backend/):
+        python database.py migrate   # aplica las migraciones pendientes
+        python database.py seed      # migra y crea los usuarios de ejemplo
+        python database.py version   # muestra la versión del esquema
+        python database.py reshard --shards 4
+            # reparte las jornadas de la distribución actual (WORKDAY_DB_SHARDS) en 4 particiones
+        python database.py archive --before 2024 [--vacuum]
+            # mueve las jornadas anteriores a 2024 a los archivos por año (ARCHIVE_DIR)
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('migrate', 'seed', 'version', 'reshard', 'archive'))
+    parser.add_argument('--shards', type=int, help="número de particiones de destino para 'reshard' (0 = un solo fichero)")
+    parser.add_argument('--before', type=int, help="primer año que 'archive' deja en la tabla principal")
+    parser.add_argument('--vacuum', action='store_true', help="compacta los ficheros de jornadas tras 'archive'")
+    args = parser.parse_args(argv)
+
+    if args.command == 'version':
+        for path in database_paths():
+            print(f"{path}: esquema en la versión {schema_version(path)} (última: {SCHEMA_VERSION})")
+        return 0
+    if args.command == 'reshard':
+        if args.shards is None or args.shards < 0:
+            parser.error("'reshard' necesita --shards N (N >= 0)")
+        moved = reshard(args.shards)
+        print(f"Filas movidas: {moved}. Arranca la aplicación con WORKDAY_DB_SHARDS={args.shards}")
+        return 0
+    if args.command == 'archive':
+        if args.before is None:
+            parser.error("'archive' necesita --before AÑO")
+        if args.before > datetime.date.today().year:
+            parser.error(f"'archive' solo cierra años terminados: --before debe ser como mucho {datetime.date.today().year}")
+        init_db()
+        archived = archive_workdays(args.before, args.vacuum)
+        for year, count in sorted(archived.items()):
+            print(f"{year}: {count} jornadas archivadas")
+        if not archived:
+            print(f"No hay jornadas anteriores a {args.before}")
+        return 0
+    applied = init_db()
+    print(f"Migraciones aplicadas: {', '.join(map(str, applied))}" if applied else "El esquema ya estaba al día")
+    if args.command == 'seed':
+        created = seed_users()
+        print(f"Usuarios creados: {', '.join(created)}" if created else "Los usuarios de ejemplo ya existían")
+    return 0
+
 
+if __name__ == '__main__':
+    sys.exit(main())
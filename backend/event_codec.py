@@ -0,0 +1,148 @@
+"""
+Codificación compacta de la columna events de workdays.
+
+Los eventos de una jornada son pocos y muy repetitivos ({event, time, duration}), así que en
+lugar de texto JSON se guardan como un BLOB binario:
+
+    cabecera: formato (1 byte) + hora base en ms (int64), la del primer evento
+    evento:   tipo (1 byte) + hora relativa a la base en ms (int32) + duración en ms (uint32)
+
+El tipo es un código de EVENT_TYPES; el código 0 indica un tipo desconocido, cuyo nombre
+sigue al evento (longitud uint16 + UTF-8). El bit EVENT_NO_DURATION del tipo marca los
+eventos sin clave 'duration' y NO_DURATION representa duration=None. Cada evento ocupa 9
+bytes frente a los ~60 del JSON, y añadir uno es concatenar bytes sin decodificar los
+anteriores. Las listas que no encajan en el formato (otras claves, horas no enteras o a más
+de ~24 días de la base) se siguen guardando como texto JSON.
+"""
+import json
+import struct
+
+# Formato del BLOB: solo tipos conocidos (registros de tamaño fijo) o con nombres literales
+FORMAT_FIXED = 1
+FORMAT_LITERALS = 2
+_HEADER = struct.Struct('<Bq')
+_EVENT = struct.Struct('<BiI')
+_NAME_LENGTH = struct.Struct('<H')
+
+# Tipos que envía app.js; los códigos ya publicados no se cambian, solo se añaden al final
+EVENT_TYPES = ('Jornada Iniciada', 'Pausa Iniciada', 'Pausa Finalizada', 'Jornada Finalizada',
+               'Jornada Reiniciada')
+_EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES, start=1)}
+EVENT_NO_DURATION = 0x80
+NO_DURATION = 0xFFFFFFFF
+_EVENT_KEYS = {'event', 'time', 'duration'}
+
+
+def is_compact(value):
+    """True si el valor de la columna está en el formato compacto."""
+    return isinstance(value, bytes) and len(value) >= _HEADER.size and value[0] in (FORMAT_FIXED, FORMAT_LITERALS)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _encode_event(event, base):
+    """Bytes de un evento relativo a `base`, o None si no cabe en el formato compacto."""
+    if not isinstance(event, dict) or not event.keys() <= _EVENT_KEYS:
+        return None
+    name = event.get('event')
+    time = event.get('time')
+    duration = event.get('duration')
+    if not isinstance(name, str) or not _is_int(time) or not -2**31 <= time - base < 2**31:
+        return None
+    if duration is None:
+        duration = NO_DURATION
+    elif not _is_int(duration) or not 0 <= duration < NO_DURATION:
+        return None
+    code = _EVENT_CODES.get(name, 0)
+    if 'duration' not in event:
+        code |= EVENT_NO_DURATION
+    data = _EVENT.pack(code, time - base, duration)
+    if not code & ~EVENT_NO_DURATION:
+        literal = name.encode('utf-8')
+        if len(literal) > 0xFFFF:
+            return None
+        data += _NAME_LENGTH.pack(len(literal)) + literal
+    return data
+
+
+def encode(events):
+    """Codifica una lista de eventos; si no encaja en el formato compacto devuelve el texto JSON."""
+    if not isinstance(events, list):
+        return json.dumps(events)
+    base = events[0].get('time') if events and isinstance(events[0], dict) else 0
+    if not _is_int(base) or not -2**63 <= base < 2**63:
+        return json.dumps(events)
+    parts = []
+    for event in events:
+        data = _encode_event(event, base)
+        if data is None:
+            return json.dumps(events)
+        parts.append(data)
+    body = b''.join(parts)
+    fmt = FORMAT_FIXED if len(body) == _EVENT.size * len(events) else FORMAT_LITERALS
+    return _HEADER.pack(fmt, base) + body
+
+
+def decode(value):
+    """Lista de eventos de un valor en formato compacto."""
+    fmt, base = _HEADER.unpack_from(value)
+    if fmt == FORMAT_FIXED:
+        # Registros de tamaño fijo: se desempaquetan todos de una vez
+        return [_event_dict(code, EVENT_TYPES[(code & ~EVENT_NO_DURATION) - 1], base + delta, duration)
+                for code, delta, duration in _EVENT.iter_unpack(memoryview(value)[_HEADER.size:])]
+    events = []
+    offset = _HEADER.size
+    while offset < len(value):
+        code, delta, duration = _EVENT.unpack_from(value, offset)
+        offset += _EVENT.size
+        if code & ~EVENT_NO_DURATION:
+            name = EVENT_TYPES[(code & ~EVENT_NO_DURATION) - 1]
+        else:
+            length, = _NAME_LENGTH.unpack_from(value, offset)
+            offset += _NAME_LENGTH.size
+            name = value[offset:offset + length].decode('utf-8')
+            offset += length
+        events.append(_event_dict(code, name, base + delta, duration))
+    return events
+
+
+def _event_dict(code, name, time, duration):
+    if code & EVENT_NO_DURATION:
+        return {'event': name, 'time': time}
+    return {'event': name, 'time': time, 'duration': None if duration == NO_DURATION else duration}
+
+
+def count(value):
+    """Número de eventos de un valor de la columna (compacto o texto JSON)."""
+    if not is_compact(value):
+        return len(json.loads(value)) if value else 0
+    if value[0] == FORMAT_FIXED:
+        return (len(value) - _HEADER.size) // _EVENT.size
+    return len(decode(value))
+
+
+def append(value, event):
+    """
+    Devuelve el valor de la columna con `event` añadido al final. Si el valor es compacto
+    y el evento cabe, solo se concatena su registro; en otro caso se decodifica la lista
+    completa y se vuelve a codificar.
+    """
+    if value is None:
+        return encode([event])
+    if is_compact(value):
+        data = _encode_event(event, _HEADER.unpack_from(value)[1])
+        if data is not None:
+            if len(data) > _EVENT.size and value[0] == FORMAT_FIXED:
+                value = bytes([FORMAT_LITERALS]) + value[1:]
+            return value + data
+        events = decode(value)
+    else:
+        try:
+            events = json.loads(value)
+        except ValueError:
+            events = None
+        if not isinstance(events, list):
+            events = [] # Un valor que no es una lista se sustituye por la lista nueva
+    return encode(events + [event])
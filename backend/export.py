@@ -0,0 +1,110 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import database
+
+# Cabecera del CSV, la misma que generaba el cliente más el DNI (necesario en la exportación global)
+CSV_HEADER = ['DNI', 'Fecha', 'Inicio Jornada', 'Fin Jornada', 'Tiempo Trabajo Efectivo (HH:MM:SS)',
+              'Tiempo Pausa Total (HH:MM:SS)', 'Eventos']
+
+# Número de filas que se agrupan en cada trozo enviado al cliente
+ROWS_PER_CHUNK = 200
+
+
+def format_duration(ms):
+    """Formatea milisegundos como HH:MM:SS (igual que formatTime en app.js)."""
+    if not ms or ms < 0:
+        return '00:00:00'
+    total_seconds = int(ms // 1000)
+    return f"{total_seconds // 3600:02d}:{(total_seconds % 3600) // 60:02d}:{total_seconds % 60:02d}"
+
+
+def parse_timezone(name):
+    """
+    Zona horaria IANA del parámetro tz (la del navegador, p. ej. 'Europe/Madrid').
+    Sin tz se usa UTC: el servidor no conoce la zona de quien fichó.
+    """
+    if not name:
+        return datetime.timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Zona horaria desconocida: '{name}'")
+
+
+def format_timestamp(ms, tz=datetime.timezone.utc, time_only=False):
+    """
+    Formatea una marca de tiempo en milisegundos en la zona `tz`: fecha y hora en ISO-8601
+    con el desfase (2024-05-02 08:00:00+02:00) o, con time_only, solo la hora.
+    """
+    if not ms:
+        return 'N/A'
+    moment = datetime.datetime.fromtimestamp(ms / 1000, tz)
+    return moment.strftime('%H:%M:%S') if time_only else moment.isoformat(sep=' ', timespec='seconds')
+
+
+def format_events(events, tz=datetime.timezone.utc):
+    """Resume los eventos de una jornada como 'Evento (duración) @ hora; ...'."""
+    parts = []
+    for event in events or []:
+        duration = f" ({format_duration(event.get('duration'))})" if event.get('duration') else ''
+        parts.append(f"{event.get('event')}{duration} @ {format_timestamp(event.get('time'), tz, time_only=True)}")
+    return '; '.join(parts)
+
+
+def csv_chunks(workdays, tz=datetime.timezone.utc):
+    """Genera el CSV en trozos de texto a partir de un iterable de jornadas, con las horas en `tz`."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for count, wd in enumerate(workdays, start=1):
+        work_ms = database.effective_work_ms(wd['start_time'], wd['end_time'], wd['total_break_duration'])
+        writer.writerow([
+            wd['user_dni'],
+            wd['date'],
+            format_timestamp(wd['start_time'], tz),
+            format_timestamp(wd['end_time'], tz),
+            format_duration(work_ms),
+            format_duration(wd['total_break_duration']),
+            format_events(wd.get('events'), tz),
+        ])
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(workdays, tz=None):
+    """
+    Genera una jornada JSON por línea, agrupando ROWS_PER_CHUNK líneas por trozo.
+    Las marcas de tiempo van en milisegundos desde epoch, así que `tz` no se usa.
+    """
+    lines = []
+    for wd in workdays:
+        lines.append(json.dumps(wd, separators=(',', ':')))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Comprime al vuelo un flujo de trozos de texto con gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31: cabecera y pie gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson'),
+}
@@ -0,0 +1,301 @@
+"""
+Importación masiva de usuarios y jornadas desde CSV o NDJSON (migración de datos históricos).
+
+Las filas se leen y validan una a una y se insertan con executemany en lotes grandes, cada
+lote en su propia transacción. Las filas inválidas se informan (línea y motivo) sin detener
+la importación. Al importar jornadas se eliminan los índices secundarios durante la carga y
+al final se vuelven a crear y se recalculan los agregados. Con particiones (WORKDAY_DB_SHARDS)
+cada jornada se escribe en la partición de su usuario, con un lote en curso por partición.
+
+Columnas / claves esperadas:
+    users:    dni, password, role (opcional, por defecto 'user')
+    workdays: user_dni, date (YYYY-MM-DD), start_time, end_time, total_break_duration (ms),
+              events (lista JSON; en CSV, como texto JSON)
+
+Uso (desde backend/):
+    python importer.py users usuarios.csv
+    python importer.py workdays jornadas.ndjson --batch-size 20000
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import sys
+
+import database
+
+DEFAULT_BATCH_SIZE = 10000
+# Máximo de errores que se devuelven en detalle (el total se cuenta siempre)
+MAX_REPORTED_ERRORS = 1000
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_KINDS = ('users', 'workdays')
+
+
+def detect_format(filename, default='csv'):
+    """Deduce el formato a partir de la extensión del fichero."""
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        if lowered.endswith('.csv'):
+            return 'csv'
+    return default
+
+
+def read_records(stream, fmt):
+    """
+    Recorre un flujo de texto y genera (número_de_línea, registro, error).
+    Si la línea no se puede interpretar, registro es None y error describe el problema.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'JSON inválido: {e}'
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'Cada línea debe ser un objeto JSON'
+                continue
+            yield line_number, record, None
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+
+def _parse_int(record, field, default=None):
+    """Lee un entero de un registro CSV (texto) o NDJSON (número). Vacío devuelve default."""
+    value = record.get(field)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' debe ser un entero")
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"'{field}' debe ser un entero")
+
+
+def validate_user(record):
+    """Valida un registro de usuario y devuelve la tupla a insertar. Lanza ValueError."""
+    dni = (record.get('dni') or '').strip()
+    password = record.get('password') or ''
+    role = (record.get('role') or 'user').strip()
+    if not dni:
+        raise ValueError("Falta 'dni'")
+    if not password:
+        raise ValueError("Falta 'password'")
+    if role not in ('user', 'admin'):
+        raise ValueError(f"Rol no válido: {role}")
+    return dni, database.hash_password(password), role
+
+
+def _parse_events(value):
+    """Valida la lista de eventos de una jornada (lista o texto JSON)."""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError("'events' no es JSON válido")
+    if not isinstance(value, list):
+        raise ValueError("'events' debe ser una lista")
+    for event in value:
+        if not isinstance(event, dict) or not isinstance(event.get('event'), str) \
+                or not isinstance(event.get('time'), int):
+            raise ValueError("Cada evento necesita 'event' (texto) y 'time' (ms)")
+    return value
+
+
+def validate_workday(record, known_users):
+    """Valida un registro de jornada y devuelve la tupla a insertar. Lanza ValueError."""
+    user_dni = (record.get('user_dni') or '').strip()
+    if not user_dni:
+        raise ValueError("Falta 'user_dni'")
+    if user_dni not in known_users:
+        raise ValueError(f"Usuario desconocido: {user_dni}")
+    try:
+        date = datetime.date.fromisoformat((record.get('date') or '').strip()).isoformat()
+    except ValueError:
+        raise ValueError("'date' debe tener el formato YYYY-MM-DD")
+    start_time = _parse_int(record, 'start_time')
+    end_time = _parse_int(record, 'end_time')
+    total_break_duration = _parse_int(record, 'total_break_duration', 0)
+    if start_time is not None and end_time is not None and end_time < start_time:
+        raise ValueError("'end_time' es anterior a 'start_time'")
+    if total_break_duration < 0:
+        raise ValueError("'total_break_duration' no puede ser negativo")
+    events = _parse_events(record.get('events'))
+    return user_dni, date, start_time, end_time, total_break_duration, database.encode_events(events)
+
+
+class ImportResult:
+    """Contadores y errores de una importación."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.processed = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'error': message})
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def _insert_batch(conn, query, rows, result, touched_users=None):
+    """
+    Inserta un lote en su propia transacción y acumula filas insertadas y omitidas.
+    touched_users: DNIs cuyos datos cambian con el lote (se incrementa su versión de datos).
+    """
+    before = conn.total_changes
+    with database.write_transaction(conn):
+        conn.executemany(query, rows)
+        inserted = conn.total_changes - before
+        if touched_users:
+            database.bump_data_versions(conn, touched_users)
+    result.inserted += inserted
+    result.skipped += len(rows) - inserted
+    rows.clear()
+
+
+def import_users(stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Importa usuarios. Los DNI que ya existen se omiten (no se sobrescriben)."""
+    result = ImportResult('users')
+    query = "INSERT INTO users (dni, password, role) VALUES (?, ?, ?) ON CONFLICT (dni) DO NOTHING"
+    conn = database.connect()
+    try:
+        rows = []
+        for line_number, record, error in read_records(stream, fmt):
+            result.processed += 1
+            try:
+                if error:
+                    raise ValueError(error)
+                rows.append(validate_user(record))
+            except ValueError as e:
+                result.add_error(line_number, str(e))
+                continue
+            if len(rows) >= batch_size:
+                _insert_batch(conn, query, rows, result)
+        if rows:
+            _insert_batch(conn, query, rows, result)
+    finally:
+        conn.close()
+    return result
+
+
+def import_workdays(stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE, rebuild_indexes=True):
+    """
+    Importa jornadas. Una jornada existente para el mismo (user_dni, date) se reemplaza,
+    así que repetir una importación es seguro. Los usuarios deben existir previamente.
+    """
+    result = ImportResult('workdays')
+    query = '''
+        INSERT OR REPLACE INTO workdays (user_dni, date, start_time, end_time, total_break_duration, events)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    conn = database.connect()
+    shards = {path: database.connect(path) for path in database.shard_paths()}
+    try:
+        known_users = {row[0] for row in conn.execute("SELECT dni FROM users")}
+        if rebuild_indexes:
+            # Mantener los índices fila a fila es mucho más caro que crearlos al final
+            for shard in shards.values():
+                with database.write_transaction(shard):
+                    database.drop_workday_indexes(shard)
+        try:
+            batches = {path: [] for path in shards}
+            for line_number, record, error in read_records(stream, fmt):
+                result.processed += 1
+                try:
+                    if error:
+                        raise ValueError(error)
+                    row = validate_workday(record, known_users)
+                    path = database.workday_database(row[0])
+                    if database.is_archived(path, row[1]):
+                        raise ValueError(f"El año {row[1][:4]} está archivado y no admite cambios")
+                except ValueError as e:
+                    result.add_error(line_number, str(e))
+                    continue
+                rows = batches[path]
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    _insert_batch(shards[path], query, rows, result, {row[0] for row in rows})
+            for path, rows in batches.items():
+                if rows:
+                    _insert_batch(shards[path], query, rows, result, {row[0] for row in rows})
+        finally:
+            # Los índices y agregados se restauran aunque la importación se interrumpa. Los
+            # índices van en su propia transacción para no perderlos si falla el recálculo
+            for shard in shards.values():
+                with database.write_transaction(shard):
+                    database.create_workday_indexes(shard)
+            for shard in shards.values():
+                with database.write_transaction(shard):
+                    database.rebuild_summaries(shard)
+                shard.execute("ANALYZE workdays")
+    finally:
+        for shard in shards.values():
+            shard.close()
+        conn.close()
+    return result
+
+
+def run_import(kind, stream, fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Punto de entrada común para la API y la línea de comandos."""
+    if kind == 'users':
+        return import_users(stream, fmt, batch_size)
+    if kind == 'workdays':
+        return import_workdays(stream, fmt, batch_size)
+    raise ValueError(f"Tipo de importación no soportado: {kind}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=IMPORT_KINDS)
+    parser.add_argument('path', help="fichero a importar ('-' para la entrada estándar)")
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='por defecto se deduce de la extensión')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    database.init_db()
+    if args.path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        result = run_import(args.kind, stream, fmt, args.batch_size)
+    else:
+        with open(args.path, encoding='utf-8', newline='') as stream:
+            result = run_import(args.kind, stream, fmt, args.batch_size)
+
+    summary = result.to_dict()
+    print(f"{summary['kind']}: {summary['processed']} procesadas, {summary['inserted']} insertadas, "
+          f"{summary['skipped']} omitidas, {summary['error_count']} con errores")
+    for error in summary['errors']:
+        print(f"  línea {error['line']}: {error['error']}", file=sys.stderr)
+    return 1 if summary['error_count'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
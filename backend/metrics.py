@@ -0,0 +1,237 @@
+"""
+Métricas en memoria del proceso con salida en formato de texto de Prometheus.
+
+Cada worker de gunicorn tiene sus propias métricas (la etiqueta `pid` las distingue); el
+endpoint /metrics devuelve las del worker que atiende la petición. Registrar una observación
+cuesta un bloqueo y unas pocas operaciones, así que puede quedarse activo en producción.
+"""
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+
+# Límites superiores de los buckets (segundos y bytes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos, suma y número de observaciones."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {} # label_values -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            data = self._values.get(label_values)
+            if data is None:
+                data = self._values[label_values] = [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(label_values, list(data)) for label_values, data in self._values.items()]
+        for label_values, data in items:
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += data[index]
+                yield (f'{self.name}_bucket', _format_labels(self.labels, label_values, ('le', _format_number(bound))),
+                       cumulative)
+            yield f'{self.name}_sum', _format_labels(self.labels, label_values), data[-2]
+            yield f'{self.name}_count', _format_labels(self.labels, label_values), data[-1]
+
+
+class Gauge:
+    """Valor instantáneo calculado al exportar (p. ej. profundidad de la cola de escritura)."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        if value is not None:
+            yield self.name, '', value
+
+
+_registry = []
+
+
+def register(metric):
+    """Registra una métrica; si ya existe otra con el mismo nombre, la sustituye."""
+    for index, existing in enumerate(_registry):
+        if existing.name == metric.name:
+            _registry[index] = metric
+            return metric
+    _registry.append(metric)
+    return metric
+
+
+def render():
+    """Devuelve todas las métricas registradas en formato de texto de Prometheus (0.0.4)."""
+    lines = []
+    pid = os.getpid()
+    for metric in _registry:
+        samples = list(metric.samples())
+        if not samples:
+            continue
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in samples:
+            # Añadir el pid del worker a las etiquetas de cada muestra
+            labels = f'{{pid="{pid}",{labels[1:]}' if labels else f'{{pid="{pid}"}}'
+            lines.append(f'{name}{labels} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# --- Métricas HTTP ---
+http_request_duration = register(Histogram(
+    'workday_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta.',
+    ('method', 'route', 'status')))
+http_response_size = register(Histogram(
+    'workday_http_response_size_bytes', 'Tamaño de las respuestas HTTP por ruta (sin respuestas en streaming).',
+    ('method', 'route'), buckets=SIZE_BUCKETS))
+http_slow_requests = register(Counter(
+    'workday_http_slow_requests_total', 'Peticiones que superaron el umbral de petición lenta.',
+    ('method', 'route')))
+
+# --- Métricas de base de datos ---
+db_call_duration = register(Histogram(
+    'workday_db_call_duration_seconds', 'Duración de las funciones de database.py.', ('function',)))
+db_rows_returned = register(Histogram(
+    'workday_db_rows_returned', 'Filas devueltas por las funciones de lectura de database.py.',
+    ('function',), buckets=ROW_BUCKETS))
+db_errors = register(Counter(
+    'workday_db_errors_total', 'Errores en funciones de database.py por tipo.', ('function', 'error')))
+db_lock_wait = register(Histogram(
+    'workday_db_lock_wait_seconds', 'Espera para obtener el bloqueo de escritura de SQLite (BEGIN IMMEDIATE).'))
+
+
+def observe_request(method, route, status, seconds, size):
+    http_request_duration.observe((method, route, str(status)), seconds)
+    if size is not None:
+        http_response_size.observe((method, route), size)
+
+
+def observe_lock_wait(seconds):
+    db_lock_wait.observe((), seconds)
+
+
+def _count_rows(result):
+    """Filas devueltas por una función de lectura (listas, (lista, cursor) o un único dict)."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, dict):
+        return 1
+    return None
+
+
+def _error_label(error):
+    # Distinguir los bloqueos de SQLite ('database is locked', busy) del resto de errores
+    if isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error)):
+        return 'busy'
+    return type(error).__name__
+
+
+def _instrument(name, func):
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for item in func(*args, **kwargs):
+                    rows += 1
+                    yield item
+            except Exception as e:
+                db_errors.inc((name, _error_label(e)))
+                raise
+            finally:
+                db_call_duration.observe((name,), time.perf_counter() - start)
+                db_rows_returned.observe((name,), rows)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            db_errors.inc((name, _error_label(e)))
+            raise
+        finally:
+            db_call_duration.observe((name,), time.perf_counter() - start)
+        rows = _count_rows(result)
+        if rows is not None:
+            db_rows_returned.observe((name,), rows)
+        return result
+    return wrapper
+
+
+def instrument_module(module, names):
+    """Sustituye las funciones `names` del módulo por versiones que registran duración, filas y errores."""
+    for name in names:
+        func = getattr(module, name)
+        if not getattr(func, '_instrumented', False):
+            wrapped = _instrument(name, func)
+            wrapped._instrumented = True
+            setattr(module, name, wrapped)
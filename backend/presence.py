@@ -0,0 +1,212 @@
+"""
+Vista en memoria de las jornadas abiertas ("quién está fichado ahora") para el panel de administración.
+
+Cada proceso mantiene su propia copia: se carga de la base de datos al conectarse el primer
+panel y después se actualiza con los avisos de database.py tras cada escritura de este
+proceso. Un hilo de fondo revisa cada SYNC_INTERVAL_SECONDS la tabla workday_versions para
+recoger también lo que escriben otros workers o la importación masiva. Los cambios se
+envían a los paneles conectados (Server-Sent Events) como actualizaciones individuales.
+"""
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import database
+import metrics
+
+SYNC_INTERVAL_SECONDS = float(os.environ.get('WORKDAY_PRESENCE_SYNC_SECONDS', 1))
+# Cada panel conectado por SSE ocupa un hilo del servidor mientras está abierto: solo se
+# activa con workers con hilos o gevent (WORKDAY_PRESENCE_STREAM=1). Sin él, el panel
+# consulta /admin/presence cada POLL_SECONDS.
+STREAM_ENABLED = os.environ.get('WORKDAY_PRESENCE_STREAM', '0') == '1'
+POLL_SECONDS = float(os.environ.get('WORKDAY_PRESENCE_POLL_SECONDS', 15))
+# Comentario SSE enviado sin cambios para que proxies y navegador no cierren la conexión
+HEARTBEAT_SECONDS = 15
+# Una jornada de ayer sin finalizar sigue visible (turnos de noche); las más antiguas no
+OPEN_WORKDAY_MAX_AGE_DAYS = 1
+# Mensajes pendientes por panel antes de desconectarlo (se reconecta y recibe una instantánea)
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Margen al buscar versiones recientes: una escritura puede confirmarse algo después de su updated_at
+VERSION_OVERLAP_MS = 5000
+
+EVENT_BREAK_STARTED = 'Pausa Iniciada'
+
+
+def cutoff_date():
+    """Fecha más antigua de las jornadas abiertas que se muestran."""
+    return (datetime.date.today() - datetime.timedelta(days=OPEN_WORKDAY_MAX_AGE_DAYS)).isoformat()
+
+
+def workday_state(workday):
+    """Resume una jornada abierta para el panel: trabajando o en pausa, y último evento."""
+    break_started = None
+    for event in workday.get('events') or []:
+        if event.get('event') == EVENT_BREAK_STARTED:
+            break_started = event.get('time')
+        elif str(event.get('event', '')).startswith(database.EVENT_BREAK_FINISHED):
+            break_started = None
+    events = workday.get('events') or []
+    last_event = events[-1] if events else {}
+    return {
+        'user_dni': workday['user_dni'],
+        'date': workday['date'],
+        'start_time': workday['start_time'],
+        'total_break_duration': workday['total_break_duration'] or 0,
+        'status': 'on_break' if break_started else 'working',
+        'break_started': break_started,
+        'last_event': last_event.get('event'),
+        'last_event_time': last_event.get('time'),
+    }
+
+
+def format_sse(event, data):
+    """Formatea un mensaje Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    """Cola de mensajes de un panel conectado."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def publish(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # El panel no consume lo bastante rápido: se cierra y al reconectar recibe una instantánea
+            self.closed = True
+
+    def next_message(self, timeout):
+        """Devuelve el siguiente (evento, datos) o None si no llegó nada en `timeout` segundos."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class PresenceBoard:
+    """Jornadas abiertas por DNI y paneles suscritos a sus cambios."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}    # user_dni -> workday_state(...)
+        self._versions = {}   # user_dni -> última versión de datos vista
+        self._subscribers = set()
+        self._last_sync_ms = 0
+        self._thread = None
+        self._pid = None
+
+    @property
+    def active(self):
+        return self._thread is not None and self._pid == os.getpid()
+
+    def _ensure_started(self):
+        # Tras un fork (gunicorn con preload) el hilo y los datos del padre no sirven en el hijo
+        if self.active:
+            return
+        with self._lock:
+            if self.active:
+                return
+            self._pid = os.getpid()
+            self._subscribers = set()
+            self._last_sync_ms = int(time.time() * 1000)
+            self._versions = {}
+            self._entries = {wd['user_dni']: workday_state(wd) for wd in self._latest_open_workdays()}
+            self._thread = threading.Thread(target=self._sync_loop, name='workday-presence', daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _latest_open_workdays(user_dni=None):
+        # Si un usuario tiene varias jornadas abiertas se muestra la más reciente (vienen ordenadas por fecha)
+        latest = {}
+        for wd in database.get_open_workdays(cutoff_date(), user_dni):
+            latest[wd['user_dni']] = wd
+        return latest.values()
+
+    def subscribe(self):
+        """Registra un panel y devuelve (suscriptor, instantánea actual) de forma atómica."""
+        self._ensure_started()
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            return subscriber, self._snapshot_locked()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers) if self.active else 0
+
+    def snapshot(self):
+        self._ensure_started()
+        with self._lock:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self):
+        return [self._entries[dni] for dni in sorted(self._entries)]
+
+    def notify(self, user_dni, date):
+        """Listener de database.py: vuelve a leer el estado del usuario tras una escritura."""
+        if self.active and date and date >= cutoff_date():
+            self.refresh([user_dni])
+
+    def refresh(self, user_dnis):
+        """Relee las jornadas abiertas de los usuarios indicados y publica las diferencias."""
+        for user_dni in user_dnis:
+            workdays = list(self._latest_open_workdays(user_dni))
+            state = workday_state(workdays[0]) if workdays else None
+            with self._lock:
+                previous = self._entries.get(user_dni)
+                if state == previous:
+                    continue
+                if state is None:
+                    del self._entries[user_dni]
+                    self._publish_locked(('remove', {'user_dni': user_dni, 'date': previous['date']}))
+                else:
+                    self._entries[user_dni] = state
+                    self._publish_locked(('update', state))
+
+    def _publish_locked(self, message):
+        for subscriber in list(self._subscribers):
+            subscriber.publish(message)
+            if subscriber.closed:
+                self._subscribers.discard(subscriber)
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(SYNC_INTERVAL_SECONDS)
+            try:
+                self._sync()
+            except Exception:
+                # Un fallo puntual (p. ej. base de datos bloqueada) se reintenta en la siguiente vuelta
+                logging.getLogger(__name__).warning("Error al sincronizar el panel de presencia", exc_info=True)
+
+    def _sync(self):
+        changed = []
+        rows = database.get_data_versions_since(self._last_sync_ms - VERSION_OVERLAP_MS)
+        for user_dni, version, updated_at in rows:
+            if self._versions.get(user_dni) != version:
+                self._versions[user_dni] = version
+                changed.append(user_dni)
+            self._last_sync_ms = max(self._last_sync_ms, updated_at)
+        # Al cambiar de día las jornadas abiertas demasiado antiguas dejan de mostrarse
+        cutoff = cutoff_date()
+        with self._lock:
+            changed.extend(dni for dni, state in self._entries.items() if state['date'] < cutoff)
+        if changed:
+            self.refresh(changed)
+
+
+board = PresenceBoard()
+database.add_workday_listener(board.notify)
+
+metrics.register(metrics.Gauge('workday_presence_subscribers', 'Paneles de presencia conectados a este worker.',
+                               board.subscriber_count))
@@ -0,0 +1,174 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+
+class _PendingWrite:
+    """Una escritura encolada: la función a ejecutar y el resultado que espera la petición."""
+
+    __slots__ = ('func', 'args', 'result', 'error', 'done', 'enqueued_at', 'cancelled')
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.cancelled = False
+
+
+class WriteQueue:
+    """
+    Agrupa las escrituras concurrentes de un proceso en una sola transacción (group commit).
+
+    Las peticiones llaman a submit() y quedan bloqueadas hasta que el lote en el que entró su
+    escritura se confirma, así que la respuesta HTTP solo se envía tras el commit. Un hilo de
+    fondo vacía la cola cuando reúne `max_items` escrituras o pasan `max_delay_ms` desde la
+    primera. Cada escritura se ejecuta dentro de un SAVEPOINT: si una falla, solo se deshace
+    esa y el resto del lote se confirma.
+
+    Solo aporta con workers que atienden varias peticiones a la vez (hilos o gevent); con
+    workers síncronos cada lote tendría un único elemento.
+
+    Si el hilo no puede abrir la conexión, fallan las escrituras de ese lote y lo vuelve a
+    intentar con el siguiente. submit() espera como mucho `timeout_ms`.
+    """
+
+    def __init__(self, connect, max_items=64, max_delay_ms=5.0, timeout_ms=30000):
+        self._connect = connect
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000
+        self.timeout = timeout_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def submit(self, func, *args):
+        """
+        Encola func(conn, *args), espera a que su lote se confirme y devuelve su resultado.
+        Lanza TimeoutError si no se ha confirmado en `timeout` segundos.
+        """
+        self._ensure_thread()
+        item = _PendingWrite(func, args)
+        self._queue.put(item)
+        if not item.done.wait(self.timeout):
+            # Si aún no ha entrado en un lote ya no se ejecutará; si estaba dentro del lote en
+            # curso, puede confirmarse igualmente
+            item.cancelled = True
+            raise TimeoutError(f"La escritura no se confirmó en {self.timeout:g} s")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def stats(self):
+        """Copia de las métricas acumuladas (lotes, tamaño de lote y latencias en segundos)."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_items'] = self.max_items
+        stats['max_delay_seconds'] = self.max_delay
+        return stats
+
+    def _ensure_thread(self):
+        # Tras un fork (workers de gunicorn con preload) el hilo del padre no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='workday-write-queue', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_items:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    # Sin conexión el hilo no debe morir: fallan las escrituras de este lote y
+                    # se vuelve a intentar con el siguiente
+                    logging.getLogger(__name__).exception("La cola de escritura no pudo abrir la conexión")
+                    self._fail(batch, e)
+                    continue
+            self._flush(conn, batch)
+
+    def _fail(self, batch, error):
+        """Termina sin ejecutarlas las escrituras de un lote con `error`."""
+        for item in batch:
+            item.error = error
+        self._record(batch, 0.0, time.perf_counter())
+        for item in batch:
+            item.done.set()
+
+    def _flush(self, conn, batch):
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for item in batch:
+                if item.cancelled:
+                    continue # Quien la envió ya recibió TimeoutError
+                conn.execute("SAVEPOINT write_queue_item")
+                try:
+                    item.result = item.func(conn, *item.args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_queue_item")
+                    item.error = e
+                conn.execute("RELEASE write_queue_item")
+            conn.commit()
+        except Exception as e:
+            # Falló el lote completo (p. ej. bloqueo o commit): ninguna escritura se confirmó
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            for item in batch:
+                if item.error is None:
+                    item.error = e
+                item.result = None
+        finally:
+            finished = time.perf_counter()
+            self._record(batch, finished - started, finished)
+            for item in batch:
+                item.done.set()
+
+    def _record(self, batch, flush_seconds, finished):
+        waits = [finished - item.enqueued_at for item in batch]
+        with self._stats_lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['items'] += len(batch)
+            stats['errors'] += sum(1 for item in batch if item.error is not None)
+            stats['last_batch_size'] = len(batch)
+            stats['max_batch_size'] = max(stats['max_batch_size'], len(batch))
+            stats['flush_seconds_total'] += flush_seconds
+            stats['flush_seconds_max'] = max(stats['flush_seconds_max'], flush_seconds)
+            stats['wait_seconds_total'] += sum(waits)
+            stats['wait_seconds_max'] = max(stats['wait_seconds_max'], max(waits))
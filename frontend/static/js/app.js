@@ -44,8 +44,13 @@ const newRoleSelect = document.getElementById('newRole');
 const registerUserButton = document.getElementById('registerUserButton');
 const registerUserMessage = document.getElementById('registerUserMessage');
 const filterUserDniInput = document.getElementById('filterUserDni');
+const filterDateFromInput = document.getElementById('filterDateFrom');
+const filterDateToInput = document.getElementById('filterDateTo');
 const viewAllWorkdaysButton = document.getElementById('viewAllWorkdaysButton');
 const allWorkdaysDisplay = document.getElementById('allWorkdaysDisplay');
+const loadMoreWorkdaysButton = document.getElementById('loadMoreWorkdaysButton');
+const presenceStatus = document.getElementById('presenceStatus');
+const presenceDisplay = document.getElementById('presenceDisplay');
 
 // Nuevos elementos para la gestión de usuarios
 const loadUsersButton = document.getElementById('loadUsersButton');
@@ -76,6 +81,18 @@ let currentWorkdayData = null; // Objeto para el día actual en la base de datos
 // Variables de autenticación
 let loggedInUserDni = null;
 let loggedInUserRole = null;
+let sessionToken = null; // Token emitido por /login; se envía en la cabecera Authorization
+
+// Cursor de la siguiente página de "todas las jornadas" en el panel de administración (null si no hay más)
+let allWorkdaysNextCursor = null;
+
+// Conexión en directo con las jornadas abiertas (solo mientras la pestaña de administración está visible)
+let presenceSource = null;
+let presencePollTimer = null;
+let presenceActive = false; // Panel de presencia abierto (en directo o por consultas periódicas)
+let presenceWorkdays = new Map(); // user_dni -> estado de su jornada abierta
+// Intervalo de consulta del panel si el servidor no indica otro (sin panel en directo)
+const PRESENCE_POLL_SECONDS = 15;
 
 // --- Variables para Notificaciones y Alertas ---
 let breakReminderTimeout = null;
@@ -125,6 +142,20 @@ function formatTime(ms) {
         .join(':');
 }
 
+/**
+ * Escapa un texto para insertarlo en HTML (datos enviados por los usuarios).
+ * @param {*} value - Valor a escapar.
+ * @returns {string} Texto sin caracteres especiales de HTML.
+ */
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 /**
  * Obtiene la fecha actual en formato YYYY-MM-DD.
  * @returns {string} Fecha actual.
@@ -133,6 +164,17 @@ function getTodayDateString() {
     return new Date().toISOString().slice(0, 10);
 }
 
+/**
+ * Formatea una fecha local como YYYY-MM-DD (sin pasar por UTC).
+ * @param {Date} date - Fecha a formatear.
+ * @returns {string} Fecha formateada.
+ */
+function formatDateString(date) {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
+}
+
 // --- Funciones de Notificaciones del Navegador ---
 
 /**
@@ -253,19 +295,106 @@ function playSound(soundFunction) {
 
 const API_BASE = '/api'; // Definición de la constante API_BASE
 
+// Caché de respuestas GET con ETag: se revalidan con If-None-Match y un 304 reutiliza la copia local
+const API_CACHE_MAX_ENTRIES = 50;
+const apiGetCache = new Map(); // clave: "DNI URL" -> { etag, data } (orden de inserción = uso reciente)
+
 /**
- * Realiza una petición GET a la API con el encabezado X-User-DNI.
+ * Guarda una respuesta en la caché de GET, descartando la entrada menos usada si está llena.
+ * @param {string} key - Clave de la caché.
+ * @param {string} etag - ETag devuelto por el servidor.
+ * @param {Object} data - Respuesta JSON.
+ */
+function apiCacheStore(key, etag, data) {
+    apiGetCache.delete(key);
+    apiGetCache.set(key, { etag, data: structuredClone(data) });
+    if (apiGetCache.size > API_CACHE_MAX_ENTRIES) {
+        apiGetCache.delete(apiGetCache.keys().next().value);
+    }
+}
+
+/**
+ * Convierte una respuesta en formato columnar (format=columns) en la lista de jornadas habitual.
+ * Las columnas son listas paralelas; user_dni y los tipos de evento son índices de `strings`.
+ * @param {Object} payload - Respuesta con format 'columns'.
+ * @returns {Object} La misma respuesta con `workdays` en lugar de `columns`.
+ */
+function decodeColumnarWorkdays(payload) {
+    const { format, count, strings, columns, ...rest } = payload;
+    const dnis = strings.user_dni;
+    const eventNames = strings.event || [];
+    const workdays = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const workday = {
+            user_dni: dnis[columns.user_dni[i]],
+            date: columns.date[i],
+            start_time: columns.start_time[i],
+            end_time: columns.end_time[i],
+            total_break_duration: columns.total_break_duration[i],
+        };
+        if (columns.events) {
+            // Cada evento es [tipo, time, duration] ([tipo, time] si no tenía duración) o un objeto
+            workday.events = columns.events[i].map(e => {
+                if (!Array.isArray(e)) return e;
+                const event = { event: eventNames[e[0]], time: e[1] };
+                if (e.length > 2) event.duration = e[2];
+                return event;
+            });
+        }
+        workdays[i] = workday;
+    }
+    return { ...rest, workdays };
+}
+
+/**
+ * Si el servidor rechaza con 401 el token de la sesión (caducada o cerrada), cierra la sesión
+ * local y vuelve a la pantalla de login en lugar de seguir enviando peticiones que fallan.
+ * @param {Response} response - Respuesta de fetch.
+ * @param {Object} headers - Cabeceras con las que se envió la petición.
+ * @returns {boolean} true si la petición falló por una sesión caducada.
+ */
+function handleExpiredSession(response, headers) {
+    const sentAuthorization = headers['Authorization'];
+    if (response.status !== 401 || !sentAuthorization) {
+        return false; // Sin token (p. ej. /login con credenciales incorrectas) no hay sesión que cerrar
+    }
+    // Varias peticiones pueden caducar a la vez: solo la primera cierra la sesión
+    if (sessionToken && sentAuthorization === `Bearer ${sessionToken}`) {
+        sessionToken = null; // Ya no es válido: logout() no debe enviarlo a /logout
+        logout(); // Vacía también la caché de GET
+        loginError.textContent = "La sesión ha caducado. Vuelve a iniciar sesión.";
+        loginError.classList.remove('hidden');
+    }
+    return true;
+}
+
+/**
+ * Realiza una petición GET a la API con el token de la sesión.
+ * Si hay una copia en caché se envía su ETag y, ante un 304, se devuelve esa copia.
  * @param {string} url - URL del endpoint (sin el prefijo /api).
  * @returns {Promise<Object>} Respuesta JSON de la API.
  */
 async function apiGet(url) {
     try {
         const headers = {};
-        if (loggedInUserDni) {
-            headers['X-User-DNI'] = loggedInUserDni;
+        if (sessionToken) {
+            headers['Authorization'] = `Bearer ${sessionToken}`;
         }
         const fullUrl = API_BASE + url; // <--- Aquí se añade el prefijo
-        const response = await fetch(fullUrl, { headers: headers });
+        const cacheKey = `${loggedInUserDni || ''} ${fullUrl}`;
+        const cached = apiGetCache.get(cacheKey);
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
+        }
+        // 'no-store': la revalidación la gestiona esta caché, no la del navegador
+        const response = await fetch(fullUrl, { headers: headers, cache: 'no-store' });
+        if (handleExpiredSession(response, headers)) {
+            return null;
+        }
+        if (response.status === 304 && cached) {
+            apiCacheStore(cacheKey, cached.etag, cached.data); // Marcar como usada recientemente
+            return structuredClone(cached.data); // Copia: quien llama puede modificar el resultado
+        }
         let responseData = {};
         try {
             responseData = await response.json(); // Intentar parsear siempre
@@ -278,6 +407,13 @@ async function apiGet(url) {
         if (!response.ok) {
             throw new Error(responseData.message || `Error HTTP: ${response.status}`);
         }
+        if (responseData.format === 'columns') {
+            responseData = decodeColumnarWorkdays(responseData);
+        }
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            apiCacheStore(cacheKey, etag, responseData);
+        }
         return responseData;
     } catch (error) {
         console.error("Error en petición GET:", error);
@@ -287,7 +423,7 @@ async function apiGet(url) {
 }
 
 /**
- * Realiza una petición POST a la API con el encabezado X-User-DNI.
+ * Realiza una petición POST a la API con el token de la sesión.
  * @param {string} url - URL del endpoint (sin el prefijo /api).
  * @param {Object} data - Datos a enviar en el cuerpo de la petición.
  * @returns {Promise<Object>} Respuesta JSON de la API.
@@ -297,8 +433,8 @@ async function apiPost(url, data) {
         const headers = {
             'Content-Type': 'application/json',
         };
-        if (loggedInUserDni) {
-            headers['X-User-DNI'] = loggedInUserDni;
+        if (sessionToken) {
+            headers['Authorization'] = `Bearer ${sessionToken}`;
         }
         const fullUrl = API_BASE + url; // <--- Aquí se añade el prefijo
         const response = await fetch(fullUrl, {
@@ -306,6 +442,9 @@ async function apiPost(url, data) {
             headers: headers,
             body: JSON.stringify(data),
         });
+        if (handleExpiredSession(response, headers)) {
+            return null;
+        }
         let responseData = {};
         try {
             responseData = await response.json(); // Intentar parsear siempre
@@ -326,7 +465,7 @@ async function apiPost(url, data) {
 }
 
 /**
- * Realiza una petición PUT a la API con el encabezado X-User-DNI.
+ * Realiza una petición PUT a la API con el token de la sesión.
  * @param {string} url - URL del endpoint (sin el prefijo /api).
  * @param {Object} data - Datos a enviar en el cuerpo de la petición.
  * @returns {Promise<Object>} Respuesta JSON de la API.
@@ -336,8 +475,8 @@ async function apiPut(url, data) {
         const headers = {
             'Content-Type': 'application/json',
         };
-        if (loggedInUserDni) {
-            headers['X-User-DNI'] = loggedInUserDni;
+        if (sessionToken) {
+            headers['Authorization'] = `Bearer ${sessionToken}`;
         }
         const fullUrl = API_BASE + url; // <--- Aquí se añade el prefijo
         const response = await fetch(fullUrl, {
@@ -345,6 +484,9 @@ async function apiPut(url, data) {
             headers: headers,
             body: JSON.stringify(data),
         });
+        if (handleExpiredSession(response, headers)) {
+            return null;
+        }
         let responseData = {};
         try {
             responseData = await response.json();
@@ -365,21 +507,24 @@ async function apiPut(url, data) {
 }
 
 /**
- * Realiza una petición DELETE a la API con el encabezado X-User-DNI.
+ * Realiza una petición DELETE a la API con el token de la sesión.
  * @param {string} url - URL del endpoint (sin el prefijo /api).
  * @returns {Promise<Object>} Respuesta JSON de la API.
  */
 async function apiDelete(url) {
     try {
         const headers = {};
-        if (loggedInUserDni) {
-            headers['X-User-DNI'] = loggedInUserDni;
+        if (sessionToken) {
+            headers['Authorization'] = `Bearer ${sessionToken}`;
         }
         const fullUrl = API_BASE + url; // <--- Aquí se añade el prefijo
         const response = await fetch(fullUrl, {
             method: 'DELETE',
             headers: headers,
         });
+        if (handleExpiredSession(response, headers)) {
+            return null;
+        }
         let responseData = {};
         try {
             responseData = await response.json();
@@ -420,16 +565,17 @@ async function addLogEntry(event, timestamp_ms, duration_ms = null) {
     logEntries.appendChild(entryDiv);
     logEntries.scrollTop = logEntries.scrollHeight; // Desplazar al final
 
-    currentDayLog.push({ event, time: timestamp_ms, duration: duration_ms });
+    const entry = { event, time: timestamp_ms, duration: duration_ms };
+    currentDayLog.push(entry);
 
-    // Actualizar y guardar los datos de la jornada actual
+    // Actualizar los datos de la jornada actual y enviar solo el nuevo evento al backend
     if (currentWorkdayData) {
         // Asegurarse de que el DNI del usuario logueado esté en currentWorkdayData
         currentWorkdayData.user_dni = loggedInUserDni; // Añadir user_dni aquí
         currentWorkdayData.events = currentDayLog;
         if (event === 'Jornada Iniciada') currentWorkdayData.start_time = timestamp_ms; // Cambiado a snake_case
         if (event === 'Jornada Finalizada') currentWorkdayData.end_time = timestamp_ms; // Cambiado a snake_case
-        await saveCurrentWorkdayData();
+        await saveWorkdayEvent(entry);
     }
 }
 
@@ -503,22 +649,15 @@ function updateUI() {
 }
 
 /**
- * Guarda los datos de la jornada actual en el backend.
+ * Añade un evento a la jornada actual en el backend.
+ * El servidor actualiza inicio, fin y pausas a partir del evento, sin reenviar la jornada completa.
+ * @param {Object} entry - Evento con las claves event, time y duration.
  */
-async function saveCurrentWorkdayData() {
+async function saveWorkdayEvent(entry) {
     if (currentWorkdayData && loggedInUserDni) {
-        // Asegurarse de que las claves coincidan con el backend (snake_case)
-        const dataToSend = {
-            date: currentWorkdayData.date,
-            start_time: workStartTime, // Cambiado a snake_case
-            end_time: workEndTime,     // Cambiado a snake_case
-            total_break_duration: totalBreakDuration, // Cambiado a snake_case
-            events: currentDayLog
-        };
-
-        const response = await apiPost('/workday', dataToSend); // Enviar dataToSend
+        const response = await apiPost(`/workday/${currentWorkdayData.date}/events`, entry);
         if (response && response.success) {
-            console.log("Jornada guardada en el backend.");
+            console.log("Evento guardado en el backend.");
         }
     }
 }
@@ -600,9 +739,16 @@ function updateWelcomeMessage() {
  * Cierra la sesión del usuario.
  */
 function logout() {
+    // Cerrar la sesión también en el servidor (sin esperar la respuesta)
+    if (sessionToken) {
+        apiPost('/logout', {});
+    }
     // Limpiar variables de autenticación
     loggedInUserDni = null;
     loggedInUserRole = null;
+    sessionToken = null;
+    apiGetCache.clear(); // No conservar datos del usuario anterior
+    stopPresenceUpdates();
 
     // Ocultar la aplicación y mostrar la pantalla de login
     appContainer.classList.add('hidden');
@@ -811,6 +957,13 @@ tabButtons.forEach(button => {
         const targetTabId = button.dataset.tab + 'Tab';
         document.getElementById(targetTabId).classList.remove('hidden');
 
+        // El panel de presencia solo se actualiza mientras se ve la pestaña de administración
+        if (button.dataset.tab === 'admin') {
+            startPresenceUpdates();
+        } else {
+            stopPresenceUpdates();
+        }
+
         // Si se cambia a la pestaña de registros, actualizar la vista diaria por defecto
         if (button.dataset.tab === 'records') {
             const today = getTodayDateString();
@@ -820,6 +973,10 @@ tabButtons.forEach(button => {
             // Si se cambia a la pestaña de admin, limpiar y cargar los datos de todos los usuarios
             allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">Haz clic en "Cargar Todas las Jornadas" para ver los registros.</p>';
             filterUserDniInput.value = ''; // Limpiar filtro de DNI
+            filterDateFromInput.value = ''; // Limpiar filtros de fecha
+            filterDateToInput.value = '';
+            loadMoreWorkdaysButton.classList.add('hidden');
+            allWorkdaysNextCursor = null;
             usersListDisplay.innerHTML = '<p class="text-gray-600">Haz clic en "Cargar Usuarios" para ver la lista.</p>'; // Limpiar lista de usuarios
             userManagementMessage.classList.add('hidden'); // Ocultar mensajes de gestión de usuarios
             editUserDniInput.value = ''; // Limpiar campos de edición
@@ -899,22 +1056,17 @@ async function viewDailyRecords() {
  */
 async function viewWeeklyRecords() {
     recordsDisplay.innerHTML = '<p class="text-gray-600">Cargando registros semanales...</p>';
-    const response = await apiGet('/workdays/user'); // Obtener solo las jornadas del usuario logueado
+    const today = new Date();
+    // Calcular el inicio y fin de la semana actual (domingo a sábado)
+    const startOfWeek = new Date(today.getFullYear(), today.getMonth(), today.getDate() - today.getDay());
+    const endOfWeek = new Date(startOfWeek);
+    endOfWeek.setDate(startOfWeek.getDate() + 6);
+
+    // Pedir solo las jornadas de la semana, sin eventos (la vista no los muestra)
+    const response = await apiGet(`/workdays/user?from=${formatDateString(startOfWeek)}&to=${formatDateString(endOfWeek)}&events=0&format=columns`);
 
     if (response && response.success && response.workdays) {
-        const allWorkdays = response.workdays;
-        const today = new Date();
-        // Calcular el inicio y fin de la semana actual (domingo a sábado)
-        const startOfWeek = new Date(today.getFullYear(), today.getMonth(), today.getDate() - today.getDay());
-        startOfWeek.setHours(0, 0, 0, 0); // Establecer a inicio del día
-        const endOfWeek = new Date(startOfWeek);
-        endOfWeek.setDate(startOfWeek.getDate() + 6);
-        endOfWeek.setHours(23, 59, 59, 999); // Establecer a fin del día
-
-        let weeklyWorkdays = allWorkdays.filter(wd => {
-            const wdDate = new Date(wd.date);
-            return wdDate >= startOfWeek && wdDate <= endOfWeek;
-        });
+        const weeklyWorkdays = response.workdays;
 
         if (weeklyWorkdays.length === 0) {
             recordsDisplay.innerHTML = '<p class="text-gray-600">No hay registros para esta semana.</p>';
@@ -978,18 +1130,17 @@ async function viewWeeklyRecords() {
  */
 async function viewMonthlyRecords() {
     recordsDisplay.innerHTML = '<p class="text-gray-600">Cargando registros mensuales...</p>';
-    const response = await apiGet('/workdays/user'); // Obtener solo las jornadas del usuario logueado
+    const today = new Date();
+    const currentMonth = today.getMonth();
+    const currentYear = today.getFullYear();
+    const startOfMonth = new Date(currentYear, currentMonth, 1);
+    const endOfMonth = new Date(currentYear, currentMonth + 1, 0); // Último día del mes
+
+    // Pedir solo las jornadas del mes, sin eventos (la vista no los muestra)
+    const response = await apiGet(`/workdays/user?from=${formatDateString(startOfMonth)}&to=${formatDateString(endOfMonth)}&events=0&format=columns`);
 
     if (response && response.success && response.workdays) {
-        const allWorkdays = response.workdays;
-        const today = new Date();
-        const currentMonth = today.getMonth();
-        const currentYear = today.getFullYear();
-
-        let monthlyWorkdays = allWorkdays.filter(wd => {
-            const wdDate = new Date(wd.date);
-            return wdDate.getMonth() === currentMonth && wdDate.getFullYear() === currentYear;
-        });
+        const monthlyWorkdays = response.workdays;
 
         if (monthlyWorkdays.length === 0) {
             recordsDisplay.innerHTML = '<p class="text-gray-600">No hay registros para este mes.</p>';
@@ -1050,52 +1201,37 @@ async function viewMonthlyRecords() {
 
 /**
  * Exporta los datos de todas las jornadas del usuario logueado a un archivo CSV.
+ * El CSV se genera en streaming en el servidor; aquí solo se descarga como fichero.
  */
 async function exportData() {
-    const response = await apiGet('/workdays/user'); // Obtener solo las jornadas del usuario logueado
-    if (response && response.success && response.workdays) {
-        const allWorkdays = response.workdays;
-        if (allWorkdays.length === 0) {
-            showMessage("No hay datos para exportar.");
+    try {
+        const headers = {};
+        if (sessionToken) {
+            headers['Authorization'] = `Bearer ${sessionToken}`;
+        }
+        // Las horas del CSV se escriben en la zona horaria del navegador
+        const timeZone = encodeURIComponent(Intl.DateTimeFormat().resolvedOptions().timeZone);
+        const response = await fetch(`${API_BASE}/workdays/export?format=csv&tz=${timeZone}`, { headers: headers });
+        if (handleExpiredSession(response, headers)) {
             return;
         }
+        if (!response.ok) {
+            throw new Error(`Error HTTP: ${response.status}`);
+        }
 
-        let csvContent = "data:text/csv;charset=utf-8,";
-        csvContent += "Fecha,Inicio Jornada,Fin Jornada,Tiempo Trabajo Efectivo (HH:MM:SS),Tiempo Pausa Total (HH:MM:SS),Eventos\n";
-
-        allWorkdays.forEach(wd => {
-            // Usar las claves correctas del backend (snake_case)
-            const startTime = wd.start_time ? new Date(wd.start_time).toLocaleString() : 'N/A';
-            const endTime = wd.end_time ? new Date(wd.end_time).toLocaleString() : 'N/A';
-            const totalBreak = formatTime(wd.total_break_duration || 0);
-
-            let workDuration = 0;
-            if (wd.start_time && wd.end_time) {
-                workDuration = wd.end_time - wd.start_time - (wd.total_break_duration || 0);
-                if (workDuration < 0) workDuration = 0;
-            }
-            const effectiveWork = formatTime(workDuration);
-
-            // Formatear eventos para CSV (ej. "Evento1 @ Hora1; Evento2 @ Hora2")
-            const eventsFormatted = (wd.events || []).map(e => {
-                const time = new Date(e.time).toLocaleTimeString();
-                const duration = e.duration ? ` (${formatTime(e.duration)})` : '';
-                return `${e.event}${duration} @ ${time}`;
-            }).join('; ');
-
-            csvContent += `${wd.date},"${startTime}","${endTime}","${effectiveWork}","${totalBreak}","${eventsFormatted}"\n`;
-        });
-
-        const encodedUri = encodeURI(csvContent);
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const filename = `registro_jornadas_${loggedInUserDni}.csv`; // Nombre de archivo con DNI
         const link = document.createElement("a");
-        link.setAttribute("href", encodedUri);
-        link.setAttribute("download", `registro_jornadas_${loggedInUserDni}.csv`); // Nombre de archivo con DNI
+        link.setAttribute("href", url);
+        link.setAttribute("download", filename);
         document.body.appendChild(link); // Required for Firefox
         link.click();
         document.body.removeChild(link); // Clean up
-        showMessage("Datos exportados a registro_jornadas.csv");
-
-    } else {
+        URL.revokeObjectURL(url);
+        showMessage(`Datos exportados a ${filename}`);
+    } catch (error) {
+        console.error("Error al exportar datos:", error);
         showMessage("Error al obtener datos para exportar.");
     }
 }
@@ -1111,6 +1247,7 @@ loginButton.addEventListener('click', async () => {
     if (response && response.success) {
         loggedInUserDni = response.user_dni;
         loggedInUserRole = response.role;
+        sessionToken = response.token;
 
         loginContainer.classList.add('hidden');
         appContainer.classList.remove('hidden');
@@ -1309,72 +1446,253 @@ deleteUserButton.addEventListener('click', async () => {
 });
 
 
-viewAllWorkdaysButton.addEventListener('click', async () => {
-    allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">Cargando todas las jornadas...</p>';
+/**
+ * Construye la consulta de /admin/all_workdays con los filtros del panel.
+ * @param {string|null} cursor - Cursor de la página a cargar (null para la primera).
+ * @returns {string} URL con sus parámetros.
+ */
+function buildAllWorkdaysUrl(cursor) {
+    const params = new URLSearchParams();
     const filterDni = filterUserDniInput.value.trim();
+    if (filterDni) params.set('dni', filterDni);
+    if (filterDateFromInput.value) params.set('from', filterDateFromInput.value);
+    if (filterDateToInput.value) params.set('to', filterDateToInput.value);
+    if (cursor) params.set('cursor', cursor);
+    params.set('events', '0'); // La tabla solo muestra los totales de cada jornada
+    params.set('format', 'columns');
+    return `/admin/all_workdays?${params.toString()}`;
+}
+
+/**
+ * Genera las filas de la tabla de jornadas de todos los usuarios.
+ * @param {Array<Object>} workdays - Jornadas a representar.
+ * @returns {string} HTML de las filas.
+ */
+function renderAllWorkdaysRows(workdays) {
+    let html = '';
+    workdays.forEach(wd => {
+        // Usar las claves correctas del backend (snake_case)
+        const startTime = wd.start_time ? new Date(wd.start_time).toLocaleTimeString() : 'N/A';
+        const endTime = wd.end_time ? new Date(wd.end_time).toLocaleTimeString() : 'N/A';
+        const breakDuration = wd.total_break_duration || 0;
+
+        let workDuration = 0;
+        if (wd.start_time && wd.end_time) {
+            workDuration = wd.end_time - wd.start_time - breakDuration;
+            if (workDuration < 0) workDuration = 0;
+        }
+
+        html += `<tr>
+                    <td>${escapeHtml(wd.user_dni)}</td>
+                    <td>${escapeHtml(wd.date)}</td>
+                    <td>${startTime}</td>
+                    <td>${endTime}</td>
+                    <td>${formatTime(workDuration)}</td>
+                    <td>${formatTime(breakDuration)}</td>
+                </tr>`;
+    });
+    return html;
+}
+
+/**
+ * Carga una página de jornadas de todos los usuarios, filtrada en el servidor.
+ * @param {boolean} append - true para añadir la siguiente página a la tabla existente.
+ */
+async function loadAllWorkdays(append = false) {
+    if (!append) {
+        allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">Cargando todas las jornadas...</p>';
+        allWorkdaysNextCursor = null;
+    }
+    loadMoreWorkdaysButton.classList.add('hidden');
 
-    const response = await apiGet('/admin/all_workdays');
+    const response = await apiGet(buildAllWorkdaysUrl(append ? allWorkdaysNextCursor : null));
 
     if (response && response.success && response.workdays) {
-        let allWorkdays = response.workdays;
+        allWorkdaysNextCursor = response.next_cursor || null;
 
-        // Aplicar filtro por DNI si se proporciona
-        if (filterDni) {
-            allWorkdays = allWorkdays.filter(wd => wd.user_dni === filterDni);
-            if (allWorkdays.length === 0) {
-                allWorkdaysDisplay.innerHTML = `<p class="text-gray-600">No hay jornadas para el DNI: ${filterDni}</p>`;
+        if (append) {
+            const tbody = allWorkdaysDisplay.querySelector('tbody');
+            if (tbody) tbody.insertAdjacentHTML('beforeend', renderAllWorkdaysRows(response.workdays));
+        } else {
+            if (response.workdays.length === 0) {
+                const filterDni = filterUserDniInput.value.trim();
+                allWorkdaysDisplay.innerHTML = filterDni
+                    ? `<p class="text-gray-600">No hay jornadas para el DNI: ${escapeHtml(filterDni)}</p>`
+                    : '<p class="text-gray-600">No hay jornadas registradas.</p>';
                 return;
             }
+
+            let html = `<h3 class="text-xl font-semibold mb-4">Todas las Jornadas Registradas</h3>`;
+            html += `<table class="records-table">
+                        <thead>
+                            <tr>
+                                <th>Usuario (DNI)</th>
+                                <th>Fecha</th>
+                                <th>Inicio</th>
+                                <th>Fin</th>
+                                <th>Trabajo Efectivo</th>
+                                <th>Pausa Total</th>
+                            </tr>
+                        </thead>
+                        <tbody>`;
+            html += renderAllWorkdaysRows(response.workdays);
+            html += `</tbody></table>`;
+            allWorkdaysDisplay.innerHTML = html;
         }
 
-        if (allWorkdays.length === 0) {
-            allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">No hay jornadas registradas.</p>';
-            return;
+        if (allWorkdaysNextCursor) {
+            loadMoreWorkdaysButton.classList.remove('hidden');
         }
+    } else if (!append) {
+        allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">Error al cargar todas las jornadas o no hay datos.</p>';
+    }
+}
 
-        let html = `<h3 class="text-xl font-semibold mb-4">Todas las Jornadas Registradas</h3>`;
-        html += `<table class="records-table">
+viewAllWorkdaysButton.addEventListener('click', () => loadAllWorkdays(false));
+loadMoreWorkdaysButton.addEventListener('click', () => loadAllWorkdays(true));
+
+
+// --- Usuarios Fichados Ahora (Server-Sent Events) ---
+
+/**
+ * Pinta la tabla de jornadas abiertas a partir de presenceWorkdays.
+ */
+function renderPresence() {
+    if (presenceWorkdays.size === 0) {
+        presenceDisplay.innerHTML = '<p class="text-gray-600">No hay nadie fichado en este momento.</p>';
+        return;
+    }
+
+    const workdays = [...presenceWorkdays.values()].sort((a, b) => a.user_dni.localeCompare(b.user_dni));
+    let html = `<table class="records-table">
                     <thead>
                         <tr>
                             <th>Usuario (DNI)</th>
-                            <th>Fecha</th>
+                            <th>Estado</th>
                             <th>Inicio</th>
-                            <th>Fin</th>
-                            <th>Trabajo Efectivo</th>
+                            <th>Último Evento</th>
                             <th>Pausa Total</th>
                         </tr>
                     </thead>
                     <tbody>`;
+    workdays.forEach(wd => {
+        const startTime = wd.start_time ? new Date(wd.start_time).toLocaleTimeString() : 'N/A';
+        // Las jornadas de ayer sin finalizar (turnos de noche) muestran también la fecha
+        const startLabel = wd.date === getTodayDateString() ? startTime : `${escapeHtml(wd.date)} ${startTime}`;
+        const state = wd.status === 'on_break'
+            ? `En pausa desde ${new Date(wd.break_started).toLocaleTimeString()}`
+            : 'Trabajando';
+        const lastEvent = wd.last_event
+            ? `${escapeHtml(wd.last_event)} (${new Date(wd.last_event_time).toLocaleTimeString()})`
+            : 'N/A';
+        html += `<tr>
+                    <td>${escapeHtml(wd.user_dni)}</td>
+                    <td>${state}</td>
+                    <td>${startLabel}</td>
+                    <td>${lastEvent}</td>
+                    <td>${formatTime(wd.total_break_duration || 0)}</td>
+                </tr>`;
+    });
+    html += `</tbody></table>`;
+    presenceDisplay.innerHTML = html;
+}
 
-        allWorkdays.forEach(wd => {
-            // Usar las claves correctas del backend (snake_case)
-            const startTime = wd.start_time ? new Date(wd.start_time).toLocaleTimeString() : 'N/A';
-            const endTime = wd.end_time ? new Date(wd.end_time).toLocaleTimeString() : 'N/A';
-            const breakDuration = wd.total_break_duration || 0;
-
-            let workDuration = 0;
-            if (wd.start_time && wd.end_time) {
-                workDuration = wd.end_time - wd.start_time - breakDuration;
-                if (workDuration < 0) workDuration = 0;
-            }
+/**
+ * Actualiza el texto de estado con el número de personas trabajando y en pausa.
+ */
+function updatePresenceStatus() {
+    const onBreak = [...presenceWorkdays.values()].filter(wd => wd.status === 'on_break').length;
+    presenceStatus.textContent = `En directo: ${presenceWorkdays.size - onBreak} trabajando, ${onBreak} en pausa.`;
+}
 
-            html += `<tr>
-                        <td>${wd.user_dni}</td>
-                        <td>${wd.date}</td>
-                        <td>${startTime}</td>
-                        <td>${endTime}</td>
-                        <td>${formatTime(workDuration)}</td>
-                        <td>${formatTime(breakDuration)}</td>
-                    </tr>`;
-        });
+/**
+ * Sustituye las jornadas abiertas del panel por una instantánea completa y lo repinta.
+ * @param {Array<Object>} workdays - Jornadas abiertas.
+ */
+function applyPresenceSnapshot(workdays) {
+    presenceWorkdays = new Map(workdays.map(wd => [wd.user_dni, wd]));
+    updatePresenceStatus();
+    renderPresence();
+}
 
-        html += `</tbody></table>`;
-        allWorkdaysDisplay.innerHTML = html;
+/**
+ * Inicia el panel de presencia: carga las jornadas abiertas y, si el servidor admite el panel
+ * en directo, abre la conexión SSE; si no, repite la consulta cada poll_seconds.
+ */
+async function startPresenceUpdates() {
+    if (presenceActive || loggedInUserRole !== 'admin') return;
+    presenceActive = true;
+    presenceStatus.textContent = 'Conectando...';
 
+    const response = await apiGet('/admin/presence');
+    if (!presenceActive) return; // Se salió de la pestaña mientras se cargaba
+    if (response && response.success) {
+        applyPresenceSnapshot(response.workdays);
+    }
+    if (response && response.stream) {
+        startPresenceStream();
     } else {
-        allWorkdaysDisplay.innerHTML = '<p class="text-gray-600">Error al cargar todas las jornadas o no hay datos.</p>';
+        const seconds = (response && response.poll_seconds) || PRESENCE_POLL_SECONDS;
+        presencePollTimer = setTimeout(pollPresence, seconds * 1000);
     }
-});
+}
+
+/**
+ * Consulta periódica de /admin/presence cuando el servidor no admite el panel en directo.
+ */
+async function pollPresence() {
+    presencePollTimer = null;
+    const response = await apiGet('/admin/presence');
+    if (!presenceActive) return;
+    if (response && response.success) {
+        applyPresenceSnapshot(response.workdays);
+    }
+    const seconds = (response && response.poll_seconds) || PRESENCE_POLL_SECONDS;
+    presencePollTimer = setTimeout(pollPresence, seconds * 1000);
+}
+
+/**
+ * Abre la conexión SSE: recibe una instantánea al conectar y después solo los cambios.
+ * EventSource reconecta solo si se corta, y cada reconexión empieza con una instantánea nueva.
+ */
+function startPresenceStream() {
+    if (presenceSource) return;
+
+    presenceSource = new EventSource(`${API_BASE}/admin/presence/stream`);
+
+    presenceSource.addEventListener('snapshot', event => {
+        applyPresenceSnapshot(JSON.parse(event.data));
+    });
+    presenceSource.addEventListener('update', event => {
+        const wd = JSON.parse(event.data);
+        presenceWorkdays.set(wd.user_dni, wd);
+        updatePresenceStatus();
+        renderPresence();
+    });
+    presenceSource.addEventListener('remove', event => {
+        presenceWorkdays.delete(JSON.parse(event.data).user_dni);
+        updatePresenceStatus();
+        renderPresence();
+    });
+    presenceSource.onerror = () => {
+        presenceStatus.textContent = 'Conexión perdida. Reintentando...';
+    };
+}
+
+/**
+ * Detiene el panel de presencia (al salir de la pestaña de administración o cerrar sesión).
+ */
+function stopPresenceUpdates() {
+    if (!presenceActive) return;
+    presenceActive = false;
+    if (presenceSource) {
+        presenceSource.close();
+        presenceSource = null;
+    }
+    clearTimeout(presencePollTimer);
+    presencePollTimer = null;
+    presenceStatus.textContent = 'Sin conexión.';
+}
 
 
 // --- Inicialización ---